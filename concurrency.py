@@ -0,0 +1,171 @@
+"""AIMD concurrency limit for requests in flight to Ollama.
+
+The client can't see ``OLLAMA_NUM_PARALLEL``, model size or free VRAM, but it
+can see their effect. A complete ``/api/generate`` response reports
+``total_duration`` (time the server spent on the request) and ``eval_count``;
+the gap between client-side latency and ``total_duration`` is time the request
+spent queued inside Ollama waiting for a slot. Responses cut short by the
+client (early-stop policies) carry no server durations; for those the queued
+time is the client-measured time to the first chunk above the lowest one seen
+recently. Latency is that of the attempt that succeeded, so retry backoff
+isn't mistaken for queueing, and retried attempts count as errors. So per
+window of completions:
+
+* errors or a large queued share of latency -> multiplicative decrease,
+* all slots busy, no queueing and throughput not falling -> additive increase,
+* otherwise hold.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+
+class _Slot:
+    """Handle yielded by :meth:`AIMDLimiter.slot` to report the response."""
+
+    def __init__(self):
+        self.response: Optional[dict] = None
+
+    def observe(self, response: dict):
+        self.response = response
+
+
+class AIMDLimiter:
+    """Dynamic semaphore whose limit follows additive-increase/multiplicative-decrease."""
+
+    def __init__(
+        self,
+        initial: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        window: int = 8,
+        decrease_factor: float = 0.75,
+        max_queue_fraction: float = 0.25,
+    ):
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.decrease_factor = decrease_factor
+        self.max_queue_fraction = max_queue_fraction
+        self.reason = "initial limit"
+
+        self._in_flight = 0
+        self._epoch = 0  # bumped on every limit change
+        self._saturated = False
+        self._cond = threading.Condition()
+        self._samples: List[dict] = []
+        self._window_start = time.monotonic()
+        self._last: dict = {}
+        self._prev_throughput: Optional[float] = None
+        self._history: deque = deque(maxlen=20)
+        self._first_chunk: deque = deque(maxlen=50)  # recent client times to first chunk, for the baseline
+
+    @contextmanager
+    def slot(self) -> Iterator[_Slot]:
+        """Hold one in-flight slot; call ``observe(response)`` on the yielded handle on success."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+            if self._in_flight >= self.limit:
+                self._saturated = True
+            epoch = self._epoch
+        handle = _Slot()
+        start = time.monotonic()
+        ok = False
+        try:
+            yield handle
+            ok = True
+        finally:
+            self._complete(epoch, time.monotonic() - start, ok, handle.response or {})
+
+    def _complete(self, epoch: int, latency_s: float, ok: bool, response: dict):
+        # Exclude retry backoff and failed attempts when the response says how long the last attempt took
+        latency_s = response.get("client_s", latency_s)
+        server_s = response.get("total_duration", 0) / 1e9
+        first_chunk_s = response.get("client_first_chunk_s")
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+            if server_s:
+                queue_s = max(0.0, latency_s - server_s)
+            elif first_chunk_s is not None:
+                self._first_chunk.append(first_chunk_s)
+                queue_s = first_chunk_s - min(self._first_chunk)
+            else:
+                queue_s = 0.0
+            if epoch != self._epoch:
+                return  # admitted under the previous limit; says nothing about this one
+            self._samples.append(
+                {
+                    "ok": ok,
+                    "retries": max(0, response.get("attempts", 1) - 1),
+                    "latency_s": latency_s,
+                    "queue_s": queue_s,
+                    "tokens": response.get("eval_count", 0),
+                }
+            )
+            if len(self._samples) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        now = time.monotonic()
+        samples, self._samples = self._samples, []
+        elapsed = max(now - self._window_start, 1e-6)
+        self._window_start = now
+        saturated, self._saturated = self._saturated, self._in_flight >= self.limit
+
+        errors = sum(1 for s in samples if not s["ok"]) + sum(s["retries"] for s in samples)
+        ok_samples = [s for s in samples if s["ok"]]
+        latency = statistics.median(s["latency_s"] for s in ok_samples) if ok_samples else 0.0
+        queue_fraction = (
+            sum(s["queue_s"] for s in ok_samples) / sum(s["latency_s"] for s in ok_samples) if ok_samples else 0.0
+        )
+        throughput = sum(s["tokens"] for s in ok_samples) / elapsed
+        prev = self._prev_throughput
+        self._prev_throughput = throughput
+        self._last = {
+            "throughput_tps": round(throughput, 1),
+            "latency_p50_s": round(latency, 3),
+            "queue_fraction": round(queue_fraction, 3),
+            "errors": errors,
+        }
+
+        old = self.limit
+        if errors:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            reason = f"{errors} failed attempts in {len(samples)} requests"
+        elif queue_fraction > self.max_queue_fraction:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            reason = f"{queue_fraction:.0%} of latency spent queued in Ollama"
+        elif not saturated:
+            reason = "limit not reached; holding"
+        elif prev is not None and throughput < prev * 0.95:
+            reason = f"throughput fell {1 - throughput / prev:.0%} at limit {old}; holding"
+        elif self.limit < self.max_limit:
+            self.limit += 1
+            reason = f"all slots busy, {queue_fraction:.0%} queued, {throughput:.0f} tok/s"
+        else:
+            reason = "at max limit"
+
+        self.reason = reason if self.limit == old else f"{old} -> {self.limit}: {reason}"
+        if self.limit != old:
+            self._epoch += 1
+            self._window_start = now
+            self._history.append({"time": time.time(), "from": old, "to": self.limit, "reason": reason})
+
+    def metrics(self) -> dict:
+        """Current limit, why it is what it is, and the last window's measurements."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "reason": self.reason,
+                **self._last,
+                "changes": list(self._history),
+            }
@@ -1,5 +1,7 @@
 # Style and text constants used across the application
 
+import os
+
 FONT_SIZE = "12pt"
 LAVENDER_LIGHT = "#E6E6FA"
 LAVENDER_MID = "#9B8FCC"
@@ -14,4 +16,62 @@ DEFAULT_PROMPT = (
     "including style, fit, length, fabric type, color, and texture that are visible. Include any accessories such as jewelry, belts, or shoes "
     "that you can see. Keep the description natural, fluent, and comprehensive, but ONLY include details that are actually visible in the image. "
     "No additional comments; restrict output to the actual description only."
-) 
\ No newline at end of file
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+# Generation options sent with every /api/generate request
+IMAGE_OPTIONS = {"vision": True, "temperature": 0.3, "num_predict": 500}
+TEXT_OPTIONS = {"temperature": 0.3, "num_predict": 500}
+
+# Upload budget for encoded images. The encoder picks PNG or JPEG and the highest
+# JPEG quality that fits, but never goes below the minimum quality.
+PAYLOAD_MAX_BYTES = 300_000
+PAYLOAD_MIN_JPEG_QUALITY = 70
+
+# Animated GIFs: at most MAX_FRAMES visibly different key frames (dHash distance
+# above FRAME_MIN_DISTANCE) are described, FRAME_CONCURRENCY at a time.
+MAX_FRAMES = 6
+FRAME_MIN_DISTANCE = 6
+FRAME_CONCURRENCY = 2
+
+# Generation-length policy (see generation.POLICIES): "default", "concise" or "flux-clip"
+GENERATION_POLICY = os.environ.get("OLLAMA_IMAGE_POLICY", "default")
+
+# Work started as soon as an image is dropped, before Send is pressed: the payload is
+# always prepared; the selected model can be loaded, and the whole generation can be
+# run speculatively with the current prompt/model/policy (costs GPU time if unused).
+PREFETCH_WARM_MODEL = True
+PREFETCH_SPECULATIVE_GENERATE = False
+
+# Text-only inputs whose embedding (EMBED_MODEL) has at least this cosine similarity
+# to an earlier input reuse its output. The index keeps the most recently used entries.
+EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+# Images whose perceptual hash differs by at most this many bits (out of 64) from an
+# already described image reuse that description instead of calling the model.
+# Set to -1 to disable near-duplicate detection.
+DUPLICATE_MAX_DISTANCE = 4
+
+# History panel: thumbnail edge in pixels, and how many thumbnails / full texts stay in memory
+HISTORY_THUMBNAIL_SIZE = 64
+HISTORY_THUMBNAIL_CACHE = 256
+HISTORY_TEXT_CACHE = 128
+# Bits in each result's trigram signature used by the history filter (fixed memory per result)
+HISTORY_FILTER_BITS = 2048
+
+# GPU telemetry: backend "auto" (NVML, else nvidia-smi), "nvml", "nvidia-smi" or "fake";
+# one sample every GPU_TELEMETRY_INTERVAL_S seconds, the last GPU_TELEMETRY_HISTORY kept
+GPU_TELEMETRY_BACKEND = os.environ.get("OLLAMA_IMAGE_GPU_BACKEND", "auto")
+GPU_TELEMETRY_INTERVAL_S = 1.0
+GPU_TELEMETRY_HISTORY = 300
+
+# Tiled high-detail mode: one downscaled global view plus TILE_COUNT native-resolution
+# crops (overlapping by TILE_OVERLAP of a tile), described TILE_CONCURRENCY at a time.
+# More tiles means more detail and more GPU time. TILED_MODE is the UI default.
+TILED_MODE = False
+TILE_COUNT = 4
+TILE_CONCURRENCY = 2
+TILE_OVERLAP = 0.1
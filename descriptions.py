@@ -0,0 +1,48 @@
+"""Post-processing of model output into FLUX-ready prompt text."""
+
+import re
+from typing import Iterable, List
+
+
+def clean_response(text: str) -> str:
+    """Remove unwanted characters for Flux compatibility."""
+    for repl in [
+        ("  ", " "),
+        ("*", ""),
+        ("(", ""), (")", ""),
+        ("[", ""), ("]", ""),
+        ("{", ""), ("}", ""),
+        ("<", ""), (">", ""),
+        ("FLUX:", ""),
+    ]:
+        text = text.replace(*repl)
+    text = "".join(c for c in text if c.isalnum() or c.isspace() or c in ",.-_")
+    return text.strip()
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r"(?<=\.)\s+", text) if s.strip()]
+
+
+def _words(sentence: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", sentence.lower()))
+
+
+def merge_descriptions(texts: Iterable[str], similarity: float = 0.6) -> str:
+    """Merge several descriptions of the same subject into one, dropping repeated sentences.
+
+    Sentences are kept in first-seen order; a sentence is dropped when its word
+    set overlaps an already kept sentence by at least *similarity* (Jaccard).
+    """
+    kept: List[str] = []
+    kept_words: List[set] = []
+    for text in texts:
+        for sentence in _sentences(text):
+            words = _words(sentence)
+            if not words:
+                continue
+            if any(len(words & other) / len(words | other) >= similarity for other in kept_words):
+                continue
+            kept.append(sentence)
+            kept_words.append(words)
+    return " ".join(kept)
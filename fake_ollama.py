@@ -0,0 +1,266 @@
+"""A fake Ollama server for load and fault testing without a GPU.
+
+Implements ``/api/version``, ``/api/tags``, ``/api/show``, ``/api/ps`` and
+streaming or non-streaming ``/api/generate``. Behaviour is configurable: model
+load delay, token rate, how many requests run at once (like
+``OLLAMA_NUM_PARALLEL``; the rest queue), how many models stay loaded (like
+``OLLAMA_MAX_LOADED_MODELS``; the least recently used is evicted), and
+injected errors.
+
+Usage::
+
+    python fake_ollama.py --port 11435 --token-rate 40 --parallel 2 --error-rate 0.05
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python main.py
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from typing import List, Optional
+
+_WORDS = (
+    "A person with shoulder length wavy brown hair parted on the left stands in soft daylight. "
+    "They wear a fitted navy wool coat with large buttons over a cream knit sweater. "
+    "Their expression is calm, with almond shaped eyes, thick straight eyebrows and a slight smile. "
+    "A thin silver necklace and small hoop earrings are visible."
+).split()
+
+
+@dataclass
+class FakeOllamaConfig:
+    models: List[str] = field(default_factory=lambda: ["llava:7b", "llama3:8b"])
+    vision_models: List[str] = field(default_factory=lambda: ["llava:7b"])
+    load_delay_s: float = 0.0  # paid when a request needs a model that isn't loaded
+    token_rate: float = 50.0  # tokens per second per request
+    response_tokens: int = 120  # tokens generated when num_predict doesn't cap it
+    parallel: int = 1  # requests processed at once; others wait
+    max_loaded_models: int = 1
+    error_rate: float = 0.0  # fraction of generate requests answered with error_status
+    fail_first: int = 0  # the first N generate requests always get error_status
+    error_status: int = 503
+    seed: Optional[int] = None
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop keep-alive connections on purpose (early stop); that is not an error here
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeOllamaServer:
+    """Runs the fake server on a background thread; usable as a context manager."""
+
+    def __init__(self, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self._random = random.Random(self.config.seed)
+        self._slots = threading.Semaphore(self.config.parallel)
+        self._lock = threading.Lock()
+        self.loaded: "OrderedDict[str, float]" = OrderedDict()  # model -> last used, LRU first
+        self.stats = {"requests": 0, "errors_injected": 0, "model_loads": 0, "client_disconnects": 0}
+        self._httpd = _QuietHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    def _inject_error(self) -> bool:
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.stats["requests"] <= self.config.fail_first or self._random.random() < self.config.error_rate:
+                self.stats["errors_injected"] += 1
+                return True
+        return False
+
+    def _ensure_loaded(self, model: str) -> float:
+        """Called while holding a slot; returns the load time paid."""
+        with self._lock:
+            hit = model in self.loaded
+            self.loaded[model] = time.time()
+            self.loaded.move_to_end(model)
+            if hit:
+                return 0.0
+            while len(self.loaded) > self.config.max_loaded_models:
+                self.loaded.popitem(last=False)
+            self.stats["model_loads"] += 1
+        time.sleep(self.config.load_delay_s)
+        return self.config.load_delay_s
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> dict:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._json(200, {"version": "0.0.0-fake"})
+                elif self.path == "/api/tags":
+                    models = [
+                        {"name": m, "model": m, "digest": f"fake-{m}", "details": {"parameter_size": "7B"}}
+                        for m in server.config.models
+                    ]
+                    self._json(200, {"models": models})
+                elif self.path == "/api/ps":
+                    with server._lock:
+                        loaded = list(server.loaded.items())
+                    models = [
+                        {"name": m, "model": m, "digest": f"fake-{m}", "size_vram": 4 << 30,
+                         "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(used + 300))}
+                        for m, used in loaded
+                    ]
+                    self._json(200, {"models": models})
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == "/api/show":
+                    name = body.get("model") or body.get("name")
+                    if name not in server.config.models:
+                        self._json(404, {"error": f"model '{name}' not found"})
+                        return
+                    caps = ["completion"] + (["vision"] if name in server.config.vision_models else [])
+                    self._json(200, {"capabilities": caps, "details": {"parameter_size": "7B",
+                                                                       "quantization_level": "Q4_0"}})
+                elif self.path == "/api/generate":
+                    self._generate(body)
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def _generate(self, body: dict):
+                model = body.get("model", "")
+                if model not in server.config.models:
+                    self._json(404, {"error": f"model '{model}' not found"})
+                    return
+                if server._inject_error():
+                    self._json(server.config.error_status, {"error": "injected fault"})
+                    return
+                if not body.get("prompt"):
+                    # Empty prompt just loads the model
+                    with server._slots:
+                        load = server._ensure_loaded(model)
+                    self._json(200, {"model": model, "response": "", "done": True, "load_duration": int(load * 1e9)})
+                    return
+
+                num_predict = (body.get("options") or {}).get("num_predict", server.config.response_tokens)
+                tokens = min(server.config.response_tokens, num_predict if num_predict > 0 else 10**9)
+                stream = body.get("stream", True)
+                with server._slots:
+                    start = time.perf_counter()
+                    load = server._ensure_loaded(model)
+                    if stream:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                    words = []
+                    try:
+                        for i in range(tokens):
+                            time.sleep(1.0 / server.config.token_rate)
+                            word = _WORDS[i % len(_WORDS)] + " "
+                            words.append(word)
+                            if stream:
+                                self._chunk({"model": model, "response": word, "done": False})
+                        final = {
+                            "model": model,
+                            "done": True,
+                            "done_reason": "length" if tokens == num_predict else "stop",
+                            "total_duration": int((time.perf_counter() - start) * 1e9),
+                            "load_duration": int(load * 1e9),
+                            "eval_count": tokens,
+                            "eval_duration": int(tokens / server.config.token_rate * 1e9),
+                        }
+                        if stream:
+                            self._chunk({**final, "response": ""})
+                            self.wfile.write(b"0\r\n\r\n")
+                        else:
+                            self._json(200, {**final, "response": "".join(words)})
+                    except (BrokenPipeError, ConnectionResetError):
+                        with server._lock:
+                            server.stats["client_disconnects"] += 1
+
+            def _chunk(self, obj: dict):
+                data = (json.dumps(obj) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--load-delay", type=float, default=0.0, help="seconds to load a model")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second per request")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per response")
+    parser.add_argument("--parallel", type=int, default=1, help="requests processed at once")
+    parser.add_argument("--max-loaded-models", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args(argv)
+
+    config = FakeOllamaConfig(
+        load_delay_s=args.load_delay,
+        token_rate=args.token_rate,
+        response_tokens=args.tokens,
+        parallel=args.parallel,
+        max_loaded_models=args.max_loaded_models,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    server = FakeOllamaServer(config, args.host, args.port)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
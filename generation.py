@@ -0,0 +1,144 @@
+"""Generation-length policies and the single entry point for running a generation.
+
+A policy caps ``num_predict``, adds stop sequences and can end the stream on
+the client once a token budget is met (a model-token budget, or an estimated
+CLIP-token budget for FLUX prompts). :func:`run_generation` applies the policy
+and records per-policy eval tokens and latency so :func:`policy_report` can
+show what each policy saves compared with the default.
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from constants import GENERATION_POLICY
+from ollama_api import generate
+
+_CLIP_TOKEN = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def estimate_clip_tokens(text: str) -> int:
+    """Rough CLIP BPE token count: words, digits and punctuation, long words count extra."""
+    return sum(1 + len(tok) // 8 for tok in _CLIP_TOKEN.findall(text))
+
+
+def _trim_to_sentence(text: str) -> str:
+    """Drop a trailing unfinished sentence, unless that would lose most of the text."""
+    end = text.rfind(".")
+    return text[: end + 1] if end >= len(text) // 2 else text
+
+
+@dataclass
+class GenerationPolicy:
+    name: str
+    num_predict: int = 500
+    stop: List[str] = field(default_factory=list)
+    token_budget: Optional[int] = None  # model tokens (stream chunks)
+    clip_budget: Optional[int] = None  # estimated CLIP tokens of the output
+
+    def options(self, base: dict) -> dict:
+        opts = {**base, "num_predict": self.num_predict}
+        if self.stop:
+            opts["stop"] = list(self.stop)
+        return opts
+
+    def should_stop(self, text: str, chunks: int) -> bool:
+        if self.token_budget is not None and chunks >= self.token_budget:
+            return True
+        return self.clip_budget is not None and estimate_clip_tokens(text) >= self.clip_budget
+
+    @property
+    def streams_budget(self) -> bool:
+        return self.token_budget is not None or self.clip_budget is not None
+
+
+POLICIES: Dict[str, GenerationPolicy] = {
+    p.name: p
+    for p in (
+        GenerationPolicy("default"),
+        GenerationPolicy("concise", num_predict=300, stop=["\n\n"], token_budget=220),
+        # CLIP only sees the first 77 tokens of a FLUX prompt
+        GenerationPolicy("flux-clip", num_predict=160, stop=["\n\n"], clip_budget=77),
+    )
+}
+
+
+class _PolicyStats:
+    def __init__(self):
+        self.requests = 0
+        self.early_stops = 0
+        self.eval_tokens = 0
+        self.latency_s = 0.0
+
+
+_stats: Dict[str, _PolicyStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_policy(name: Optional[str] = None) -> GenerationPolicy:
+    return POLICIES.get(name or GENERATION_POLICY, POLICIES["default"])
+
+
+def run_generation(
+    model: str,
+    prompt: str,
+    base_options: dict,
+    images: Optional[List[str]] = None,
+    policy: Optional[GenerationPolicy] = None,
+) -> dict:
+    """Run ``/api/generate`` under *policy* and record its cost. Returns the response body."""
+    policy = policy or get_policy()
+    start = time.perf_counter()
+    result = generate(
+        model,
+        prompt,
+        images=images,
+        options=policy.options(base_options),
+        should_stop=policy.should_stop if policy.streams_budget else None,
+    )
+    latency = time.perf_counter() - start
+    stopped = result.get("done_reason") == "client_stop"
+    if stopped:
+        result["response"] = _trim_to_sentence(result["response"])
+    with _stats_lock:
+        stats = _stats.setdefault(policy.name, _PolicyStats())
+        stats.requests += 1
+        stats.early_stops += stopped
+        stats.eval_tokens += result.get("eval_count", 0)
+        stats.latency_s += latency
+    return result
+
+
+def policy_report() -> Dict[str, dict]:
+    """Per-policy means and estimated savings against the ``default`` policy.
+
+    Savings use the measured default means when the default policy has run in
+    this process; otherwise the baseline is the default ``num_predict`` cap at
+    the policy's own measured token rate.
+    """
+    with _stats_lock:
+        snapshot = {name: vars(s).copy() for name, s in _stats.items()}
+    base = snapshot.get("default")
+    report = {}
+    for name, s in snapshot.items():
+        n = s["requests"]
+        mean_tokens = s["eval_tokens"] / n
+        mean_latency = s["latency_s"] / n
+        if base and base["requests"]:
+            base_tokens = base["eval_tokens"] / base["requests"]
+            base_latency = base["latency_s"] / base["requests"]
+        else:
+            base_tokens = POLICIES["default"].num_predict
+            rate = mean_tokens / mean_latency if mean_latency else 0.0
+            base_latency = base_tokens / rate if rate else mean_latency
+        report[name] = {
+            "requests": n,
+            "early_stops": s["early_stops"],
+            "mean_eval_tokens": round(mean_tokens, 1),
+            "mean_latency_s": round(mean_latency, 3),
+            "eval_tokens_saved": round(max(0.0, base_tokens - mean_tokens) * n),
+            "latency_saved_s": round(max(0.0, base_latency - mean_latency) * n, 3),
+        }
+    return report
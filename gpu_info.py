@@ -1,13 +1,63 @@
+import html
 from typing import List
 
+from gpu_telemetry import GPU_TELEMETRY, GpuTelemetry, sparkline
+
 try:
     import GPUtil
 except ImportError:  # pragma: no cover
     GPUtil = None
 
+# Samples shown in the sparklines (at the default 1s interval: the last minute)
+SPARKLINE_SAMPLES = 60
+
 
 def get_gpu_info_html() -> str:
-    """Return HTML-formatted GPU information for display in the UI."""
+    """Return HTML-formatted GPU information for display in the UI.
+
+    Uses the background telemetry sampler when a backend is available, else a
+    one-off GPUtil reading. The sampler is started off the calling (GUI) thread.
+    """
+    if GPU_TELEMETRY.running:
+        return get_telemetry_html(GPU_TELEMETRY)
+    if GPU_TELEMETRY.unavailable:
+        return _gputil_html()
+    GPU_TELEMETRY.start_in_background()
+    return "<b>GPU Info:</b> <i>Starting GPU telemetry...</i>"
+
+
+def get_telemetry_html(telemetry: GpuTelemetry) -> str:
+    """Latest reading per GPU with min/avg/max over the history and sparklines."""
+    latest = telemetry.latest()
+    if not latest:
+        if telemetry.error:
+            return f"<b>GPU Info:</b> <span style='color:#b00;'><i>Error: {html.escape(telemetry.error)}</i></span>"
+        return "<b>GPU Info:</b> <i>Sampling...</i>"
+
+    lines: List[str] = [f"<b>GPU Info</b> <small>({telemetry.backend.name})</small><b>:</b>"]
+    for gpu in latest:
+        stats = telemetry.summary(gpu.index)
+        history = telemetry.history(gpu.index)
+        util_min, util_avg, util_max = stats["util"]
+        mem_max = stats["mem_used_mb"][2]
+        util_spark = sparkline([s.util for s in history], SPARKLINE_SAMPLES, 0, 100)
+        mem_spark = sparkline([s.mem_used_mb for s in history], SPARKLINE_SAMPLES, 0, gpu.mem_total_mb)
+        lines.append(
+            f"<b>GPU {gpu.index}:</b> {html.escape(gpu.name)}<br>"
+            f"&nbsp;&nbsp;Load: {gpu.util:.1f}% (min {util_min:.0f} / avg {util_avg:.0f} / max {util_max:.0f})<br>"
+            f"&nbsp;&nbsp;<span style='font-family:monospace;'>{util_spark}</span><br>"
+            f"&nbsp;&nbsp;Memory: {gpu.mem_used_mb:.1f}MB / {gpu.mem_total_mb:.1f}MB ({gpu.mem_util:.1f}%, "
+            f"peak {mem_max:.0f}MB)<br>"
+            f"&nbsp;&nbsp;<span style='font-family:monospace;'>{mem_spark}</span><br>"
+            f"&nbsp;&nbsp;Temperature: {gpu.temperature_c:.0f}°C (max {stats['temperature_c'][2]:.0f}°C)"
+        )
+        if gpu.power_w is not None:
+            lines.append(f", Power: {gpu.power_w:.0f}W")
+        lines.append("<br>")
+    return "<div style='line-height:1.5;'>" + "".join(lines) + "</div>"
+
+
+def _gputil_html() -> str:
     if GPUtil is None:
         return "<b>GPU Info:</b> <i>GPUtil not installed.</i>"
 
@@ -19,11 +69,11 @@ def get_gpu_info_html() -> str:
         lines: List[str] = ["<b>GPU Info:</b>"]
         for gpu in gpus:
             lines.append(
-                f"<b>GPU {gpu.id}:</b> {gpu.name}<br>"
+                f"<b>GPU {gpu.id}:</b> {html.escape(gpu.name)}<br>"
                 f"&nbsp;&nbsp;Load: {gpu.load*100:.1f}%<br>"
                 f"&nbsp;&nbsp;Memory: {gpu.memoryUsed:.1f}MB / {gpu.memoryTotal:.1f}MB ({gpu.memoryUtil*100:.1f}%)<br>"
                 f"&nbsp;&nbsp;Temperature: {gpu.temperature}°C<br>"
             )
         return "<div style='line-height:1.5;'>" + "".join(lines) + "</div>"
     except Exception as exc:
-        return f"<b>GPU Info:</b> <span style='color:#b00;'><i>Error: {exc}</i></span>" 
\ No newline at end of file
+        return f"<b>GPU Info:</b> <span style='color:#b00;'><i>Error: {html.escape(str(exc))}</i></span>"
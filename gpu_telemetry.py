@@ -0,0 +1,374 @@
+"""Background GPU telemetry with a fixed-size history.
+
+A sampler thread reads utilisation, memory, temperature and power from a
+pluggable backend at a fixed rate and keeps the last ``history`` samples per
+GPU in a ring buffer, so the UI can show min/avg/max and a sparkline instead of
+a single reading. Backends, best first:
+
+* ``nvml`` - NVML through ``pynvml`` (``pip install nvidia-ml-py``); an
+  in-process library call, no subprocess.
+* ``nvidia-smi`` - one long-running ``nvidia-smi --loop-ms`` process whose
+  output is parsed as it arrives, instead of a fork per reading.
+* ``fake`` - synthetic readings for tests and machines without a GPU.
+
+The wall and CPU time of every sample is measured and reported by
+:meth:`GpuTelemetry.sample_cost`. For ``nvidia-smi`` that includes the CPU the
+helper process burns between samples (read from ``/proc``); where that can't
+be read the figure covers only our reader and says so.
+"""
+
+import logging
+import math
+import os
+import random
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from constants import GPU_TELEMETRY_BACKEND, GPU_TELEMETRY_HISTORY, GPU_TELEMETRY_INTERVAL_S
+
+try:
+    import pynvml
+except ImportError:  # pragma: no cover
+    pynvml = None
+
+logger = logging.getLogger(__name__)
+
+_SPARK = "▁▂▃▄▅▆▇█"
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+@dataclass
+class GpuSample:
+    timestamp: float
+    index: int
+    name: str
+    util: float  # percent
+    mem_used_mb: float
+    mem_total_mb: float
+    temperature_c: float
+    power_w: Optional[float] = None
+
+    @property
+    def mem_util(self) -> float:
+        return 100.0 * self.mem_used_mb / self.mem_total_mb if self.mem_total_mb else 0.0
+
+
+class NvmlBackend:
+    name = "nvml"
+
+    def __init__(self):
+        if pynvml is None:
+            raise RuntimeError("pynvml is not installed")
+        pynvml.nvmlInit()
+        self._handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+        self._names = [_decode(pynvml.nvmlDeviceGetName(h)) for h in self._handles]
+
+    def sample(self) -> List[GpuSample]:
+        now = time.time()
+        samples = []
+        for index, handle in enumerate(self._handles):
+            util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+            mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+            try:
+                power = pynvml.nvmlDeviceGetPowerUsage(handle) / 1000.0
+            except pynvml.NVMLError:
+                power = None
+            samples.append(GpuSample(
+                now, index, self._names[index], float(util.gpu), mem.used / 2**20, mem.total / 2**20,
+                float(pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)), power,
+            ))
+        return samples
+
+    def close(self):
+        pynvml.nvmlShutdown()
+
+
+class NvidiaSmiBackend:
+    """Keeps one ``nvidia-smi`` running in loop mode and returns its latest readings."""
+
+    name = "nvidia-smi"
+    _FIELDS = "index,name,utilization.gpu,memory.used,memory.total,temperature.gpu,power.draw"
+
+    def __init__(self, interval_s: float = GPU_TELEMETRY_INTERVAL_S):
+        exe = shutil.which("nvidia-smi")
+        if exe is None:
+            raise RuntimeError("nvidia-smi not found")
+        self._proc = subprocess.Popen(
+            [exe, f"--query-gpu={self._FIELDS}", "--format=csv,noheader,nounits",
+             f"--loop-ms={max(100, int(interval_s * 1000))}"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        self._latest: Dict[int, GpuSample] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        threading.Thread(target=self._read, name="nvidia-smi-reader", daemon=True).start()
+        if not self._ready.wait(5):
+            self.close()
+            raise RuntimeError("nvidia-smi produced no output")
+
+    def _read(self):
+        for line in self._proc.stdout:
+            parts = [p.strip() for p in line.split(",")]
+            if len(parts) != 7:
+                continue
+            try:
+                sample = GpuSample(
+                    time.time(), int(parts[0]), parts[1], float(parts[2]), float(parts[3]), float(parts[4]),
+                    float(parts[5]), _float_or_none(parts[6]),
+                )
+            except ValueError:
+                continue
+            with self._lock:
+                self._latest[sample.index] = sample
+            self._ready.set()
+
+    def sample(self) -> List[GpuSample]:
+        if self._proc.poll() is not None:
+            raise RuntimeError(f"nvidia-smi exited with {self._proc.returncode}")
+        with self._lock:
+            return [self._latest[i] for i in sorted(self._latest)]
+
+    def helper_cpu_time(self) -> Optional[float]:
+        """CPU seconds (user + system) used so far by the nvidia-smi process; None without ``/proc``."""
+        try:
+            with open(f"/proc/{self._proc.pid}/stat") as fh:
+                # Fields after the parenthesised command name; utime and stime are the 14th and 15th
+                fields = fh.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK
+
+    def close(self, timeout: float = 2.0):
+        if self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+
+
+class FakeBackend:
+    """Deterministic-ish synthetic GPUs: a slow utilisation wave with noise."""
+
+    name = "fake"
+
+    def __init__(self, gpus: int = 1, mem_total_mb: float = 24576.0, seed: Optional[int] = None):
+        self.gpus = gpus
+        self.mem_total_mb = mem_total_mb
+        self._random = random.Random(seed)
+        self._start = time.monotonic()
+
+    def sample(self) -> List[GpuSample]:
+        now, t = time.time(), time.monotonic() - self._start
+        samples = []
+        for index in range(self.gpus):
+            util = max(0.0, min(100.0, 50 + 45 * math.sin(t / 10 + index) + self._random.uniform(-5, 5)))
+            samples.append(GpuSample(
+                now, index, f"Fake GPU {index}", util, self.mem_total_mb * (0.3 + util / 250), self.mem_total_mb,
+                40 + util * 0.4, 50 + util * 2.5,
+            ))
+        return samples
+
+    def close(self):
+        pass
+
+
+def create_backend(name: str = GPU_TELEMETRY_BACKEND, interval_s: float = GPU_TELEMETRY_INTERVAL_S):
+    """Return the backend called *name*, or for ``"auto"`` the first that works (``None`` if none)."""
+    factories = {
+        "nvml": NvmlBackend,
+        "nvidia-smi": lambda: NvidiaSmiBackend(interval_s),
+        "fake": FakeBackend,
+    }
+    if name != "auto":
+        if name not in factories:
+            raise ValueError(f"Unknown GPU telemetry backend {name!r}; choose auto, {', '.join(factories)}")
+        return factories[name]()
+    for candidate in ("nvml", "nvidia-smi"):
+        try:
+            return factories[candidate]()
+        except Exception as exc:
+            logger.debug("GPU telemetry backend %s unavailable: %s", candidate, exc)
+    return None
+
+
+class GpuTelemetry:
+    """Samples a backend every *interval_s* seconds into per-GPU ring buffers."""
+
+    def __init__(self, backend=None, interval_s: float = GPU_TELEMETRY_INTERVAL_S, history: int = GPU_TELEMETRY_HISTORY):
+        self.backend = backend
+        self._auto_backend = backend is None  # chosen by start(), so stop() may drop it
+        self.interval_s = interval_s
+        self.history_size = history
+        self._history: Dict[int, Deque[GpuSample]] = {}
+        self._costs: Deque[tuple] = deque(maxlen=history)  # (wall_s, cpu_s) per sample
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error = ""
+        self.cost_scope = "in-process"
+        self._helper_cpu: Optional[float] = None
+        self._no_backend = False
+        self._starting = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def starting(self) -> bool:
+        return self._starting
+
+    @property
+    def unavailable(self) -> bool:
+        """True once backend selection has failed; :meth:`start` won't probe again."""
+        return self._no_backend
+
+    def start(self) -> bool:
+        """Start sampling (choosing a backend if none was given). Returns False if no backend works."""
+        if self.running:
+            return True
+        if self._no_backend:
+            return False
+        if self.backend is None:
+            self.backend = create_backend(interval_s=self.interval_s)
+            if self.backend is None:
+                # Don't probe again on every refresh
+                self._no_backend = True
+                self.error = "no NVML or nvidia-smi available"
+                return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gpu-telemetry", daemon=True)
+        self._thread.start()
+        return True
+
+    def start_in_background(self):
+        """Like :meth:`start`, but return at once; probing a backend can block for seconds."""
+        if self.running or self._starting or self._no_backend:
+            return
+        self._starting = True
+        threading.Thread(target=self._start_worker, name="gpu-telemetry-start", daemon=True).start()
+
+    def _start_worker(self):
+        try:
+            self.start()
+        except Exception as exc:
+            logger.warning("GPU telemetry unavailable: %s", exc)
+            self._no_backend = True
+            self.error = str(exc)
+        finally:
+            self._starting = False
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.backend is not None:
+            self.backend.close()
+            if self._auto_backend:
+                # A closed backend can't sample again; the next start() picks a fresh one
+                self.backend = None
+                self._helper_cpu = None
+
+    def sample_once(self) -> List[GpuSample]:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        samples = self.backend.sample()
+        cost = (time.perf_counter() - wall, time.thread_time() - cpu + self._helper_cpu_delta())
+        with self._lock:
+            self._costs.append(cost)
+            for s in samples:
+                self._history.setdefault(s.index, deque(maxlen=self.history_size)).append(s)
+        return samples
+
+    def _helper_cpu_delta(self) -> float:
+        """CPU a helper process (nvidia-smi) used since the previous sample."""
+        read = getattr(self.backend, "helper_cpu_time", None)
+        if read is None:
+            return 0.0
+        now = read()
+        if now is None:
+            self.cost_scope = f"reader only; {self.backend.name} CPU not measured"
+            return 0.0
+        self.cost_scope = f"reader + {self.backend.name} process"
+        previous, self._helper_cpu = self._helper_cpu, now
+        return 0.0 if previous is None else now - previous
+
+    def _run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+                self.error = ""
+            except Exception as exc:
+                if not self.error:
+                    logger.warning("GPU telemetry sample failed: %s", exc)
+                self.error = str(exc)
+            next_at += self.interval_s
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def latest(self) -> List[GpuSample]:
+        with self._lock:
+            return [h[-1] for _, h in sorted(self._history.items()) if h]
+
+    def history(self, index: int) -> List[GpuSample]:
+        with self._lock:
+            return list(self._history.get(index, ()))
+
+    def summary(self, index: int) -> Dict[str, tuple]:
+        """``{"util" | "mem_used_mb" | "temperature_c" | "power_w": (min, avg, max)}`` over the buffer."""
+        samples = self.history(index)
+        result = {}
+        for name in ("util", "mem_used_mb", "temperature_c", "power_w"):
+            values = [v for v in (getattr(s, name) for s in samples) if v is not None]
+            if values:
+                result[name] = (min(values), sum(values) / len(values), max(values))
+        return result
+
+    def sample_cost(self) -> dict:
+        """Mean and max wall/CPU milliseconds per sample, the share of one core used, and what was measured."""
+        with self._lock:
+            costs = list(self._costs)
+        if not costs:
+            return {"samples": 0}
+        walls, cpus = [c[0] for c in costs], [c[1] for c in costs]
+        return {
+            "samples": len(costs),
+            "wall_ms_mean": round(1000 * sum(walls) / len(walls), 3),
+            "wall_ms_max": round(1000 * max(walls), 3),
+            "cpu_ms_mean": round(1000 * sum(cpus) / len(cpus), 3),
+            "cpu_share": round(sum(cpus) / len(cpus) / self.interval_s, 5),
+            "scope": self.cost_scope,
+        }
+
+
+def sparkline(values: List[float], width: int = 40, lo: Optional[float] = None, hi: Optional[float] = None) -> str:
+    """Render the last *width* values as Unicode block characters."""
+    values = values[-width:]
+    if not values:
+        return ""
+    lo = min(values) if lo is None else lo
+    hi = max(values) if hi is None else hi
+    span_ = (hi - lo) or 1.0
+    return "".join(_SPARK[min(len(_SPARK) - 1, int((v - lo) / span_ * len(_SPARK)))] for v in values)
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _float_or_none(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:  # "[N/A]" on GPUs without power readings
+        return None
+
+
+# Shared by the UI; started on first use
+GPU_TELEMETRY = GpuTelemetry()
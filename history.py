@@ -0,0 +1,305 @@
+"""Results history panel that stays fast with thousands of results.
+
+Output text goes to an append-only spool file; the model keeps only a small
+record per result (offset into the spool, a one-line preview, source and
+model) plus a fixed-size signature of the three-character substrings of the
+full text. The filter uses the signature to rule rows out and reads the spool
+only for the few that might match, so it searches the full text while memory
+per result stays constant. Full text is read back when a row is copied or
+hovered, and thumbnails are decoded off the GUI thread only for rows the view
+actually paints, with both kept in small LRU caches. The view uses uniform item
+sizes so Qt lays out and repaints only the visible rows.
+"""
+
+import json
+import logging
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSize, QSortFilterProxyModel, Qt, pyqtSignal
+from PyQt6.QtGui import QIcon, QImage, QImageReader, QKeySequence, QPixmap, QShortcut
+from PyQt6.QtWidgets import QApplication, QHBoxLayout, QLineEdit, QListView, QPushButton, QVBoxLayout, QWidget
+
+from constants import HISTORY_FILTER_BITS, HISTORY_TEXT_CACHE, HISTORY_THUMBNAIL_CACHE, HISTORY_THUMBNAIL_SIZE
+
+logger = logging.getLogger(__name__)
+
+TEXT_ROLE = Qt.ItemDataRole.UserRole + 1
+FILTER_ROLE = Qt.ItemDataRole.UserRole + 2
+
+_PREVIEW_CHARS = 120
+
+
+def trigram_signature(text: str, bits: int = HISTORY_FILTER_BITS) -> int:
+    """Bloom-style bitset of the three-byte substrings of *text* as UTF-8 (lowercase it first).
+
+    A text can only contain a term if its signature has every bit of the
+    term's signature; terms shorter than three bytes have an empty one.
+    """
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint32)
+    if len(data) < 3:
+        return 0
+    grams = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    # Multiplicative hash: the high bits of the product are well mixed
+    positions = ((grams * np.uint32(2654435761)) >> np.uint32(11)) % np.uint32(bits)
+    signature = np.zeros(bits // 8, dtype=np.uint8)
+    np.bitwise_or.at(signature, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+    return int.from_bytes(signature.tobytes(), "little")
+
+
+class ResultSpool:
+    """Append-only store for result text; callers keep ``(offset, length)`` handles."""
+
+    def __init__(self, cache_size: int = HISTORY_TEXT_CACHE):
+        self._file = tempfile.TemporaryFile(prefix="ollama-image-history-")
+        self._end = 0
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def append(self, text: str) -> tuple:
+        data = text.encode("utf-8")
+        offset = self._end
+        self._file.seek(offset)
+        self._file.write(data)
+        self._end += len(data)
+        return offset, len(data)
+
+    def read(self, offset: int, length: int, cache: bool = True) -> str:
+        """Return the text at *offset*; ``cache=False`` for scans that shouldn't evict displayed rows."""
+        text = self._cache.get(offset)
+        if text is None:
+            self._file.seek(offset)
+            text = self._file.read(length).decode("utf-8")
+            if not cache:
+                return text
+            self._cache[offset] = text
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(offset)
+        return text
+
+
+class _Entry:
+    __slots__ = ("timestamp", "model", "source", "image_path", "offset", "length", "preview", "signature")
+
+    def __init__(self, timestamp, model, source, image_path, offset, length, preview, signature):
+        self.timestamp = timestamp
+        self.model = model
+        self.source = source
+        self.image_path = image_path
+        self.offset = offset
+        self.length = length
+        self.preview = preview
+        self.signature = signature
+
+
+class HistoryModel(QAbstractListModel):
+    """Newest-first list of results backed by a :class:`ResultSpool`."""
+
+    _thumbnail_ready = pyqtSignal(int, QImage)  # (entry id, image), emitted from loader threads
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries: List[_Entry] = []
+        self._spool = ResultSpool()
+        self._thumbnails: "OrderedDict[int, QIcon]" = OrderedDict()
+        self._loading: set = set()
+        self._loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+        self._placeholder = QIcon(_blank_pixmap())
+        self._thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    # -- adding results ---------------------------------------------------
+    def add_result(self, text: str, model: str, source: str, image_path: Optional[str] = None):
+        self.add_results([(text, model, source, image_path)])
+
+    def add_results(self, results: list):
+        """Append ``(text, model, source, image_path)`` tuples in one model update."""
+        if not results:
+            return
+        entries = []
+        for text, model, source, image_path in results:
+            offset, length = self._spool.append(text)
+            preview = " ".join(text.split())[:_PREVIEW_CHARS]
+            signature = trigram_signature(text.lower())
+            entries.append(_Entry(time.time(), model, source, image_path, offset, length, preview, signature))
+        # Newest first: new entries become rows 0..n-1
+        self.beginInsertRows(QModelIndex(), 0, len(entries) - 1)
+        self._entries.extend(entries)
+        self.endInsertRows()
+
+    def load_jsonl(self, path: str) -> int:
+        """Import ``pipeline.py`` output. Returns the number of results added."""
+        results = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                r = json.loads(line)
+                if r.get("description") and not r.get("error"):
+                    results.append((r["description"], r.get("model", ""), Path(r["path"]).name, r["path"]))
+        self.add_results(results)
+        return len(results)
+
+    def text(self, row: int) -> str:
+        entry = self._entry(row)
+        return self._spool.read(entry.offset, entry.length)
+
+    def filter_key(self, row: int) -> tuple:
+        """``(lowercase "source model", trigram signature of the full text)``."""
+        entry = self._entry(row)
+        return f"{entry.source} {entry.model}".lower(), entry.signature
+
+    def matches(self, row: int, terms: List[tuple]) -> bool:
+        """True if every ``(term, trigram_signature(term))`` is in the row's source/model or full text.
+
+        The signature rules most rows out; the spool is read only when it can't.
+        """
+        header, signature = self.filter_key(row)
+        text = None
+        for term, mask in terms:
+            if term in header:
+                continue
+            if signature & mask != mask:
+                return False
+            if text is None:
+                entry = self._entry(row)
+                text = self._spool.read(entry.offset, entry.length, cache=False).lower()
+            if term not in text:
+                return False
+        return True
+
+    # -- Qt model interface ---------------------------------------------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entry(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            stamp = time.strftime("%H:%M:%S", time.localtime(entry.timestamp))
+            return f"{stamp}  {entry.source}  [{entry.model}]\n{entry.preview}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._thumbnail(self._entry_id(index.row()), entry)
+        if role == Qt.ItemDataRole.ToolTipRole or role == TEXT_ROLE:
+            return self._spool.read(entry.offset, entry.length)
+        if role == FILTER_ROLE:
+            return self.filter_key(index.row())
+        return None
+
+    # -- thumbnails --------------------------------------------------------
+    def _thumbnail(self, entry_id: int, entry: _Entry) -> Optional[QIcon]:
+        if not entry.image_path:
+            return None
+        icon = self._thumbnails.get(entry_id)
+        if icon is not None:
+            self._thumbnails.move_to_end(entry_id)
+            return icon
+        if entry_id not in self._loading:
+            self._loading.add(entry_id)
+            self._loader.submit(self._load_thumbnail, entry_id, entry.image_path)
+        return self._placeholder
+
+    def _load_thumbnail(self, entry_id: int, path: str):
+        reader = QImageReader(path)
+        size = reader.size()
+        if size.isValid():
+            # Let the decoder scale (JPEG decodes at 1/2..1/8 directly)
+            reader.setScaledSize(size.scaled(HISTORY_THUMBNAIL_SIZE, HISTORY_THUMBNAIL_SIZE,
+                                             Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            logger.debug("No thumbnail for %s: %s", path, reader.errorString())
+        self._thumbnail_ready.emit(entry_id, image)
+
+    def _on_thumbnail_ready(self, entry_id: int, image: QImage):
+        self._loading.discard(entry_id)
+        self._thumbnails[entry_id] = QIcon(QPixmap.fromImage(image)) if not image.isNull() else self._placeholder
+        while len(self._thumbnails) > HISTORY_THUMBNAIL_CACHE:
+            self._thumbnails.popitem(last=False)
+        row = len(self._entries) - 1 - entry_id
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def _entry_id(self, row: int) -> int:
+        return len(self._entries) - 1 - row
+
+    def _entry(self, row: int) -> _Entry:
+        return self._entries[self._entry_id(row)]
+
+
+def _blank_pixmap() -> QPixmap:
+    pix = QPixmap(HISTORY_THUMBNAIL_SIZE, HISTORY_THUMBNAIL_SIZE)
+    pix.fill(Qt.GlobalColor.transparent)
+    return pix
+
+
+class HistoryFilterProxy(QSortFilterProxyModel):
+    """Keeps rows whose source, model or full text contains every whitespace-separated filter term.
+
+    Terms are case-insensitive and can come in any order. Rows added while a
+    filter is active are checked against it as they arrive.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._terms: List[tuple] = []  # (term, trigram_signature(term))
+
+    def set_query(self, text: str):
+        self._terms = [(term, trigram_signature(term)) for term in dict.fromkeys(text.lower().split())]
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        # Not via index().data(FILTER_ROLE): that round trip dominates the cost on large histories
+        return not self._terms or self.sourceModel().matches(source_row, self._terms)
+
+
+class HistoryPanel(QWidget):
+    """Filterable history list; double-click emits the full text, Ctrl+C copies it."""
+
+    activated = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = HistoryModel(self)
+        self.proxy = HistoryFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter history (full text)...")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self.proxy.set_query)
+        layout.addWidget(self.filter_edit)
+
+        self.view = QListView()
+        self.view.setModel(self.proxy)
+        self.view.setUniformItemSizes(True)
+        self.view.setIconSize(QSize(HISTORY_THUMBNAIL_SIZE, HISTORY_THUMBNAIL_SIZE))
+        self.view.setWordWrap(False)
+        self.view.setTextElideMode(Qt.TextElideMode.ElideRight)
+        self.view.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.view.doubleClicked.connect(lambda index: self.activated.emit(index.data(TEXT_ROLE)))
+        layout.addWidget(self.view)
+
+        buttons = QHBoxLayout()
+        copy_btn = QPushButton("Copy")
+        copy_btn.clicked.connect(self.copy_selected)
+        buttons.addWidget(copy_btn)
+        layout.addLayout(buttons)
+        self.buttons = buttons
+
+        QShortcut(QKeySequence.StandardKey.Copy, self.view, activated=self.copy_selected)
+
+    def copy_selected(self):
+        rows = sorted(self.view.selectionModel().selectedRows(), key=lambda index: index.row())
+        if rows:
+            QApplication.clipboard().setText("\n\n".join(index.data(TEXT_ROLE) for index in rows))
@@ -0,0 +1,104 @@
+"""Perceptual hashing and near-duplicate lookup for already described images."""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+def dhash(img: Image.Image, hash_size: int = 8) -> int:
+    """Return the difference hash of *img* as a ``hash_size**2``-bit integer.
+
+    The image is reduced to a ``(hash_size + 1) x hash_size`` grayscale grid and
+    each bit records whether a pixel is brighter than its right-hand neighbour,
+    so re-encodes and rescales of the same picture land within a few bits.
+    """
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes using Hamming distance."""
+
+    def __init__(self):
+        # Node layout: [hash, value, {distance: child_node}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, h: int, value: Any) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [h, value, {}]
+            return
+        node = self._root
+        while True:
+            dist = hamming(h, node[0])
+            if dist == 0:
+                node[1] = value
+                self._size -= 1
+                return
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [h, value, {}]
+                return
+            node = child
+
+    def search(self, h: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Return ``(distance, value)`` pairs within *max_distance*, closest first."""
+        if self._root is None:
+            return []
+        found: List[Tuple[int, Any]] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            dist = hamming(h, node[0])
+            if dist <= max_distance:
+                found.append((dist, node[1]))
+            lo, hi = dist - max_distance, dist + max_distance
+            stack.extend(child for d, child in node[2].items() if lo <= d <= hi)
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class DuplicateIndex:
+    """Thread-safe store of past descriptions, searchable by perceptual hash.
+
+    Results are partitioned by ``(model, prompt)`` because the same picture
+    described by another model or prompt is not a reusable answer.
+    """
+
+    def __init__(self):
+        self._trees: Dict[Tuple[str, str], BKTree] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, h: int, model: str, prompt: str, max_distance: int) -> Optional[Tuple[int, dict]]:
+        """Return ``(distance, entry)`` for the nearest match, or ``None``."""
+        if max_distance < 0:
+            return None
+        with self._lock:
+            tree = self._trees.get((model, prompt))
+            matches = tree.search(h, max_distance) if tree else []
+        return matches[0] if matches else None
+
+    def add(self, h: int, model: str, prompt: str, image_path: str, description: str) -> None:
+        entry = {"path": image_path, "description": description}
+        with self._lock:
+            self._trees.setdefault((model, prompt), BKTree()).add(h, entry)
+
+
+# Shared by all workers for the lifetime of the process
+DUPLICATE_INDEX = DuplicateIndex()
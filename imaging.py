@@ -0,0 +1,294 @@
+"""Image preparation helpers shared by the GUI workers and the batch pipeline.
+
+Everything here is plain Pillow code with no Qt dependency so it can run in
+worker processes.
+"""
+
+import base64
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageFilter
+
+from constants import PAYLOAD_MAX_BYTES, PAYLOAD_MIN_JPEG_QUALITY
+from image_hash import dhash
+from tracing import TRACER, in_worker_process, span
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_SIZE = 800
+JPEG_MAX_QUALITY = 95
+
+# Content classification thresholds: colour count on a 128px thumbnail, share of
+# strong edge pixels on the image being encoded
+_GRAPHIC_MAX_COLORS = 32
+_STRONG_EDGE = 96
+_TEXT_MIN_EDGE_FRACTION = 0.2
+
+# Background preparation started by prefetch_image_payload, keyed like _prepare_cached
+_prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+_inflight: Dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def open_rgb(image_path: str | Path) -> Image.Image:
+    """Open and fully decode *image_path* as an RGB image."""
+    with span("file_open", path=str(image_path)):
+        img = Image.open(image_path)
+    with img, span("decode", size=img.size, mode=img.mode):
+        img.load()
+        return img.convert("RGB") if img.mode != "RGB" else img.copy()
+
+
+def downscale(img: Image.Image, max_size: int = MAX_IMAGE_SIZE) -> Image.Image:
+    """Resize if very large (>max_size px in any dimension), keeping aspect ratio."""
+    if max(img.size) <= max_size:
+        return img
+    ratio = max_size / max(img.size)
+    new_size = tuple(int(dim * ratio) for dim in img.size)
+    with span("resize", size=img.size, new_size=new_size):
+        return img.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def classify_content(img: Image.Image) -> str:
+    """Return ``"graphic"``, ``"text"`` or ``"photo"`` for choosing an encoder.
+
+    Flat graphics have few distinct colours and compress best losslessly;
+    screenshots and scans have a high share of hard edges that JPEG chroma
+    subsampling smears; everything else is treated as a photo.
+    """
+    thumb = img.copy()
+    # Nearest neighbour: a smoothing filter would blend new colours into every edge
+    thumb.thumbnail((128, 128), Image.Resampling.NEAREST, reducing_gap=None)
+    if thumb.getcolors(maxcolors=_GRAPHIC_MAX_COLORS) is not None:
+        return "graphic"
+    histogram = img.convert("L").filter(ImageFilter.FIND_EDGES).histogram()
+    if sum(histogram[_STRONG_EDGE:]) / sum(histogram) >= _TEXT_MIN_EDGE_FRACTION:
+        return "text"
+    return "photo"
+
+
+def _encode(img: Image.Image, fmt: str, quality: Optional[int] = None, subsampling: Optional[int] = None) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        kwargs = {"quality": quality, "optimize": True}
+        if subsampling is not None:
+            kwargs["subsampling"] = subsampling
+        try:
+            img.save(buf, format="JPEG", **kwargs)
+        except OSError:
+            # With optimize, Pillow buffers the whole file in about one byte per
+            # pixel, which very noisy images at high quality overflow
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", **{**kwargs, "optimize": False})
+    return buf.getvalue()
+
+
+def _best_jpeg(img: Image.Image, max_bytes: int, min_quality: int, subsampling: Optional[int]) -> tuple:
+    """Binary-search the highest JPEG quality that fits *max_bytes*.
+
+    Falls back to *min_quality* (the fidelity floor) when nothing fits.
+    Returns ``(data, quality, attempts)``.
+    """
+    lo, hi = min_quality, JPEG_MAX_QUALITY
+    best = None
+    attempts = 0
+    while lo <= hi:
+        q = (lo + hi) // 2
+        data = _encode(img, "JPEG", q, subsampling)
+        attempts += 1
+        if len(data) <= max_bytes:
+            best = (data, q)
+            lo = q + 1
+        else:
+            hi = q - 1
+    if best is None:
+        best = (_encode(img, "JPEG", min_quality, subsampling), min_quality)
+        attempts += 1
+    return best[0], best[1], attempts
+
+
+def encode_for_budget(
+    img: Image.Image,
+    max_bytes: int = PAYLOAD_MAX_BYTES,
+    min_quality: int = PAYLOAD_MIN_JPEG_QUALITY,
+) -> dict:
+    """Pick a format and quality for *img* that fits *max_bytes* without dropping below *min_quality*.
+
+    Graphics and text try lossless PNG first; text falls back to JPEG without
+    chroma subsampling so glyph edges stay sharp. Photos use the highest JPEG
+    quality that fits. If even *min_quality* exceeds the budget, fidelity wins
+    and the result is over budget (``within_budget`` is False).
+    """
+    with span("encode") as sp:
+        encoded = _encode_for_budget(img, max_bytes, min_quality)
+        sp.set(strategy=encoded["strategy"], bytes=len(encoded["data"]))
+    return encoded
+
+
+def _encode_for_budget(img: Image.Image, max_bytes: int, min_quality: int) -> dict:
+    start = time.perf_counter()
+    content = classify_content(img)
+    data = None
+    fmt, quality, attempts = "PNG", None, 0
+
+    if content in ("graphic", "text"):
+        data = _encode(img, "PNG")
+        attempts += 1
+        if len(data) > max_bytes:
+            data = None
+
+    if data is None:
+        subsampling = 0 if content == "text" else None
+        data, quality, jpeg_attempts = _best_jpeg(img, max_bytes, min_quality, subsampling)
+        fmt = "JPEG"
+        attempts += jpeg_attempts
+
+    encode_s = time.perf_counter() - start
+    strategy = f"{content}/{fmt.lower()}"
+    logger.info(
+        "Encoded %dx%d %s as %s%s: %d bytes in %.1f ms (%d attempts, budget %d)",
+        img.width, img.height, content, fmt, f" q={quality}" if quality else "",
+        len(data), encode_s * 1000, attempts, max_bytes,
+    )
+    return {
+        "format": fmt,
+        "quality": quality,
+        "data": data,
+        "strategy": strategy,
+        "encode_s": encode_s,
+        "within_budget": len(data) <= max_bytes,
+    }
+
+
+class EncodeStats:
+    """Per-strategy payload size and encode time, fed with prepared payloads.
+
+    Payloads are usually prepared in worker processes, so the totals are kept
+    by whoever collects them rather than in module state.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def add(self, payload: dict):
+        with self._lock:
+            entry = self._totals.setdefault(
+                payload["strategy"], {"count": 0, "bytes": 0, "encode_s": 0.0, "over_budget": 0}
+            )
+            entry["count"] += 1
+            entry["bytes"] += payload["payload_bytes"]
+            entry["encode_s"] += payload["encode_s"]
+            entry["over_budget"] += not payload["within_budget"]
+
+    def report(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    "count": entry["count"],
+                    "over_budget": entry["over_budget"],
+                    "avg_bytes": round(entry["bytes"] / entry["count"]),
+                    "avg_encode_ms": round(entry["encode_s"] * 1000 / entry["count"], 2),
+                }
+                for name, entry in sorted(self._totals.items())
+            }
+
+
+def to_base64(data: bytes) -> str:
+    with span("base64", bytes=len(data)):
+        return base64.b64encode(data).decode()
+
+
+def encode_base64(img: Image.Image) -> str:
+    """Encode *img* within the payload budget and return it base64 encoded for the Ollama API."""
+    return to_base64(encode_for_budget(img)["data"])
+
+
+def prepare_image_payload(
+    image_path: str | Path,
+    max_size: int = MAX_IMAGE_SIZE,
+    max_bytes: int = PAYLOAD_MAX_BYTES,
+    min_quality: int = PAYLOAD_MIN_JPEG_QUALITY,
+) -> dict:
+    """Decode, hash, resize and encode one image.
+
+    Returns a picklable dict with the base64 payload, the perceptual hash and
+    the time spent, so it can be produced in a separate process. Results are
+    cached per file version and settings, so re-sending an unchanged image
+    skips the work entirely.
+    """
+    key = _payload_key(image_path, max_size, max_bytes, min_quality)
+    with _inflight_lock:
+        pending = _inflight.get(key)
+    # A prefetch for exactly this file version and settings is running: wait for it instead of redoing it
+    payload = pending.result() if pending is not None else _prepare_cached(*key)
+    if TRACER.enabled and in_worker_process():
+        # Hand this process's spans back to the parent along with the payload
+        return {**payload, "trace_events": TRACER.drain()}
+    return payload
+
+
+def prefetch_image_payload(
+    image_path: str | Path,
+    max_size: int = MAX_IMAGE_SIZE,
+    max_bytes: int = PAYLOAD_MAX_BYTES,
+    min_quality: int = PAYLOAD_MIN_JPEG_QUALITY,
+) -> Future:
+    """Start preparing *image_path* in the background so a later send finds it ready.
+
+    A later :func:`prepare_image_payload` call for the same file version and
+    settings waits for this work (or hits the cache); if the file or settings
+    changed in between, the key differs and the prefetched result is simply
+    never used.
+    """
+    key = _payload_key(image_path, max_size, max_bytes, min_quality)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _prefetch_pool.submit(_prepare_cached, *key)
+            _inflight[key] = future
+            future.add_done_callback(lambda _f: _forget_inflight(key))
+    return future
+
+
+def _forget_inflight(key: tuple):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+def _payload_key(image_path: str | Path, max_size: int, max_bytes: int, min_quality: int) -> tuple:
+    stat = os.stat(image_path)
+    return str(image_path), stat.st_mtime_ns, stat.st_size, max_size, max_bytes, min_quality
+
+
+@lru_cache(maxsize=32)
+def _prepare_cached(
+    image_path: str, mtime_ns: int, file_size: int, max_size: int, max_bytes: int, min_quality: int
+) -> dict:
+    # mtime_ns/file_size only take part in the cache key
+    start = time.perf_counter()
+    img = open_rgb(image_path)
+    image_hash = dhash(img)
+    encoded = encode_for_budget(downscale(img, max_size), max_bytes, min_quality)
+    return {
+        "path": image_path,
+        "image_b64": to_base64(encoded["data"]),
+        "hash": image_hash,
+        "format": encoded["format"],
+        "quality": encoded["quality"],
+        "strategy": encoded["strategy"],
+        "payload_bytes": len(encoded["data"]),
+        "within_budget": encoded["within_budget"],
+        "encode_s": encoded["encode_s"],
+        "prepare_s": time.perf_counter() - start,
+    }
@@ -0,0 +1,203 @@
+"""Write-ahead journal for resumable batch jobs.
+
+A journal is an append-only JSONL file: one ``job`` header (model, prompt,
+policy, output file), one ``queued`` record per image, then ``started``,
+``done`` and ``failed`` records as the batch runs. Records are flushed as they
+are written and fsynced in batches, so a crash loses at most the last batch;
+the worst case is that a few images are described again. ``done`` records
+carry the result, so the output file can be repaired from the journal.
+
+Resuming replays the journal, reconciles it with the output file (finished
+results missing from the file are appended; results in the file that the
+journal lost are recorded as done) and returns the images that still need work.
+Image paths are stored resolved, so a job can be resumed from any directory.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve(path: str) -> str:
+    return str(Path(path).resolve())
+
+
+class BatchJournal:
+    """Append-only job log; use :meth:`create` or :meth:`open`, not the constructor."""
+
+    def __init__(self, path: str, fsync_every: int = 64, fsync_interval_s: float = 1.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval_s = fsync_interval_s
+        self.meta: dict = {}
+        self.jobs: Dict[Tuple[str, str], int] = {}  # (path, model) -> job id
+        self.results: Dict[int, dict] = {}  # job id -> result of the last "done" record
+        self.failed: Dict[int, str] = {}
+        self.replay_s = 0.0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    # -- creation / replay -----------------------------------------------------
+    @classmethod
+    def create(cls, path: str, jobs: Iterable[Tuple[str, str]], meta: dict, **kwargs) -> "BatchJournal":
+        """Start a new journal for *jobs* (``(path, model)`` pairs; paths are stored resolved).
+
+        Raises
+        ------
+        FileExistsError
+            If *path* already exists (resume it instead).
+        """
+        journal = cls(path, **kwargs)
+        journal.meta = dict(meta)
+        journal._file = open(path, "x", encoding="utf-8")
+        journal._write({"op": "job", "created": time.time(), **journal.meta})
+        for image_path, model in jobs:
+            image_path = _resolve(image_path)
+            if (image_path, model) not in journal.jobs:
+                job_id = len(journal.jobs)
+                journal.jobs[(image_path, model)] = job_id
+                journal._write({"op": "queued", "id": job_id, "path": image_path, "model": model})
+        journal.sync()
+        return journal
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> "BatchJournal":
+        """Replay an existing journal and reopen it for appending."""
+        journal = cls(path, **kwargs)
+        start = time.perf_counter()
+        with open(path, "rb") as fh:
+            data = fh.read()
+        # A crash can leave a torn last line; drop it so new records start cleanly
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning("Dropping %d bytes of incomplete record at the end of %s", len(data) - end, path)
+            with open(path, "r+b") as fh:
+                fh.truncate(end)
+        for line in data[:end].splitlines():
+            if line:
+                journal._replay(json.loads(line))
+        journal.replay_s = time.perf_counter() - start
+        if not journal.meta:
+            raise ValueError(f"{path} is not a batch journal (no job header)")
+        journal._file = open(path, "a", encoding="utf-8")
+        logger.info(
+            "Replayed %s in %.2fs: %d jobs, %d done, %d failed",
+            path, journal.replay_s, len(journal.jobs), len(journal.results), len(journal.failed),
+        )
+        return journal
+
+    def _replay(self, record: dict):
+        op = record.get("op")
+        if op == "queued":
+            self.jobs[(record["path"], record["model"])] = record["id"]
+        elif op == "done":
+            self.results[record["id"]] = record["result"]
+            self.failed.pop(record["id"], None)
+        elif op == "failed":
+            self.failed[record["id"]] = record.get("error", "")
+        elif op == "job":
+            self.meta = {k: v for k, v in record.items() if k not in ("op", "created")}
+
+    # -- queries ---------------------------------------------------------------
+    def pending(self) -> List[Tuple[str, str]]:
+        """Jobs without a ``done`` record (failed ones are retried), in queue order."""
+        return [job for job, job_id in self.jobs.items() if job_id not in self.results]
+
+    def reconcile_output(self, out_path: str) -> Tuple[int, int]:
+        """Make the journal and *out_path* agree on finished results.
+
+        Returns ``(restored, recovered)``: results appended to the file from the
+        journal, and results found in the file that are now recorded as done.
+        """
+        written = set()
+        recovered = 0
+        if os.path.exists(out_path):
+            with open(out_path, "rb") as fh:
+                data = fh.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                with open(out_path, "r+b") as fh:
+                    fh.truncate(end)  # torn line from a crash
+            for line in data[:end].splitlines():
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                if not r.get("path"):
+                    continue
+                key = (_resolve(r["path"]), r.get("model"))
+                written.add(key)
+                job_id = self.jobs.get(key)
+                if job_id is not None and job_id not in self.results and not r.get("error"):
+                    self.record_result(r)
+                    recovered += 1
+        missing = [r for r in self.results.values() if (_resolve(r["path"]), r.get("model")) not in written]
+        if missing:
+            with open(out_path, "a", encoding="utf-8") as fh:
+                for r in missing:
+                    fh.write(json.dumps(r) + "\n")
+        self.sync()
+        return len(missing), recovered
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self.jobs),
+            "done": len(self.results),
+            "failed": len(self.failed),
+            "replay_s": round(self.replay_s, 3),
+        }
+
+    # -- recording -------------------------------------------------------------
+    def record_start(self, path: str, model: str):
+        job_id = self.jobs.get((_resolve(path), model))
+        if job_id is not None:
+            self._append({"op": "started", "id": job_id})
+
+    def record_result(self, result: dict):
+        job_id = self.jobs.get((_resolve(result["path"]), result.get("model", "")))
+        if job_id is None:
+            return
+        if result.get("error"):
+            self.failed[job_id] = result["error"]
+            self._append({"op": "failed", "id": job_id, "error": result["error"]})
+        else:
+            self.results[job_id] = result
+            self.failed.pop(job_id, None)  # succeeded on a retry
+            self._append({"op": "done", "id": job_id, "result": result})
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _append(self, record: dict):
+        with self._lock:
+            self._write(record)
+            self._file.flush()
+            now = time.monotonic()
+            if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval_s:
+                self._sync()
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
@@ -0,0 +1,237 @@
+"""Load generator: drives the real batch pipeline against the fake Ollama server.
+
+Synthetic images are written to a temporary directory and described through
+:class:`pipeline.BatchPipeline` while :mod:`fake_ollama` plays the server. The
+report has per-image latency percentiles, throughput and peak RSS of this
+process and of the largest preparation worker; ``--max-p95`` / ``--max-p99`` /
+``--min-throughput`` turn it into a pass/fail regression check.
+``--trace-memory`` adds tracemalloc's peak of Python allocations in this
+process, at a large cost in speed (the in-process fake server is traced too),
+so don't combine it with the gates.
+
+Usage::
+
+    python loadgen.py --images 100 --io-workers 4 --parallel 2 --token-rate 80
+    python loadgen.py --models llava:7b,bakllava --load-delay 3   # interleaved models
+    python loadgen.py --url http://gpu-box:11434 --model llava --images 50
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw
+
+import ollama_api
+from concurrency import AIMDLimiter
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from generation import POLICIES
+from pipeline import BatchPipeline
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile: the smallest value with at least *pct*% of values at or below it; 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # pct * n / 100 rather than pct / 100 * n: e.g. 0.07 * 100 is 7.000000000000001
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def make_images(directory: str, count: int, size: int = 640, seed: int = 0) -> List[str]:
+    """Write *count* distinct random-shape JPEGs (distinct enough to defeat the duplicate index)."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (size, size * 3 // 4), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x0, y0 = rng.randrange(size), rng.randrange(size * 3 // 4)
+            x1, y1 = x0 + rng.randrange(20, size // 2), y0 + rng.randrange(20, size // 2)
+            draw.rectangle((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = os.path.join(directory, f"load_{i:05d}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def _peak_rss_mb(who: int) -> Optional[float]:
+    """Peak RSS of this process (``RUSAGE_SELF``) or of its largest reaped child (``RUSAGE_CHILDREN``)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_load(
+    image_paths: List[Union[str, Tuple[str, str]]],
+    model: str,
+    io_workers: int = 2,
+    prepare_workers: Optional[int] = None,
+    queue_size: int = 8,
+    adaptive: bool = False,
+    max_in_flight: int = 8,
+    policy: Optional[str] = None,
+    trace_memory: bool = False,
+) -> dict:
+    """Run one load test against whatever ``ollama_api.OLLAMA_BASE_URL`` points at."""
+    latencies: List[float] = []
+
+    def on_result(result: dict):
+        if not result["error"] and not result["duplicate_of"]:
+            latencies.append(result["generate_s"])
+
+    pipeline = BatchPipeline(
+        model,
+        prepare_workers=prepare_workers,
+        io_workers=io_workers,
+        queue_size=queue_size,
+        limiter=AIMDLimiter(initial=io_workers, max_limit=max_in_flight) if adaptive else None,
+        policy=policy,
+    )
+    memory = {}
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            report = pipeline.run(image_paths, on_result=on_result)
+            memory["python_peak"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        finally:
+            tracemalloc.stop()
+    else:
+        report = pipeline.run(image_paths, on_result=on_result)
+    if resource is not None:
+        # The pool has shut down by now, so its workers count as reaped children
+        memory["peak_rss"] = _peak_rss_mb(resource.RUSAGE_SELF)
+        memory["peak_rss_largest_worker"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    tokens = sum(p["mean_eval_tokens"] * p["requests"] for p in report["generation"].values())
+    wall_s = report["wall_s"]
+    return {
+        "images": len(image_paths),
+        "ok": report["ok"],
+        "failed": report["failed"],
+        "duplicates": report["duplicates"],
+        "wall_s": wall_s,
+        "latency_s": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+        },
+        "throughput": {
+            "images_per_s": round(report["ok"] / wall_s, 3) if wall_s else 0.0,
+            "tokens_per_s": round(tokens / wall_s, 1) if wall_s else 0.0,
+        },
+        "memory_mb": memory,
+        "bottleneck": report["bottleneck"],
+        "stages": report["stages"],
+        "scheduler": report["scheduler"],
+        **({"concurrency": report["concurrency"]} if "concurrency" in report else {}),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the batch pipeline against a fake (or real) Ollama.")
+    parser.add_argument("--images", type=int, default=50, help="number of synthetic images")
+    parser.add_argument("--image-size", type=int, default=640, help="width of the synthetic images")
+    parser.add_argument("--model", default="llava:7b")
+    parser.add_argument("--models", help="comma-separated models assigned to images round-robin (overrides --model)")
+    parser.add_argument("--url", help="use this Ollama server instead of starting the fake one")
+    parser.add_argument("--io-workers", type=int, default=2)
+    parser.add_argument("--prepare-workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default=None)
+    fake = parser.add_argument_group("fake server")
+    fake.add_argument("--load-delay", type=float, default=0.5, help="seconds to load the model")
+    fake.add_argument("--token-rate", type=float, default=100.0, help="tokens per second per request")
+    fake.add_argument("--tokens", type=int, default=120, help="tokens per response")
+    fake.add_argument("--parallel", type=int, default=2, help="requests the server processes at once")
+    fake.add_argument("--max-loaded-models", type=int, default=1)
+    fake.add_argument("--error-rate", type=float, default=0.0)
+    fake.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report tracemalloc's Python peak (slows the run; distorts the gates)")
+    gate = parser.add_argument_group("regression gates")
+    gate.add_argument("--max-p95", type=float, help="fail if p95 latency (s) is above this")
+    gate.add_argument("--max-p99", type=float, help="fail if p99 latency (s) is above this")
+    gate.add_argument("--min-throughput", type=float, help="fail if images/s is below this")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    models = args.models.split(",") if args.models else [args.model]
+    server = None
+    if args.url:
+        ollama_api.OLLAMA_BASE_URL = args.url
+    else:
+        config = FakeOllamaConfig(
+            models=models,
+            vision_models=models,
+            load_delay_s=args.load_delay,
+            token_rate=args.token_rate,
+            response_tokens=args.tokens,
+            parallel=args.parallel,
+            max_loaded_models=args.max_loaded_models,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            seed=0,
+        )
+        server = FakeOllamaServer(config).start()
+        ollama_api.OLLAMA_BASE_URL = server.url
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="ollama-load-") as tmp:
+            start = time.perf_counter()
+            paths = make_images(tmp, args.images, args.image_size)
+            logger.info("Generated %d images in %.1fs", len(paths), time.perf_counter() - start)
+            jobs = [(path, models[i % len(models)]) for i, path in enumerate(paths)]
+            result = run_load(
+                jobs,
+                models[0],
+                io_workers=args.io_workers,
+                prepare_workers=args.prepare_workers,
+                queue_size=args.queue_size,
+                adaptive=args.adaptive,
+                max_in_flight=args.max_in_flight,
+                policy=args.policy,
+                trace_memory=args.trace_memory,
+            )
+        if server is not None:
+            result["server"] = dict(server.stats)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if args.max_p95 is not None and result["latency_s"]["p95"] > args.max_p95:
+        failures.append(f"p95 latency {result['latency_s']['p95']}s > {args.max_p95}s")
+    if args.max_p99 is not None and result["latency_s"]["p99"] > args.max_p99:
+        failures.append(f"p99 latency {result['latency_s']['p99']}s > {args.max_p99}s")
+    if args.min_throughput is not None and result["throughput"]["images_per_s"] < args.min_throughput:
+        failures.append(f"throughput {result['throughput']['images_per_s']} images/s < {args.min_throughput}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Capabilities of installed Ollama models, cached per model digest.
+
+``/api/tags`` is cheap and lists every model with its digest; ``/api/show``
+is only called for digests we have not seen before. The cache is also kept on
+disk so a restart doesn't re-query unchanged models.
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from ollama_api import list_models, show_model
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_PATH = os.environ.get(
+    "OLLAMA_IMAGE_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ollama-image", "models.json")
+)
+
+# Families that indicate an image encoder (LLaVA-style CLIP projector, Llama 3.2 Vision)
+_VISION_FAMILIES = {"clip", "mllama"}
+
+
+@dataclass
+class ModelInfo:
+    name: str
+    digest: str
+    vision: bool = False
+    context_length: Optional[int] = None
+    parameter_size: str = ""
+    quantization: str = ""
+    families: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = ["vision" if self.vision else "text only"]
+        if self.parameter_size:
+            parts.append(self.parameter_size)
+        if self.quantization:
+            parts.append(self.quantization)
+        if self.context_length:
+            parts.append(f"{self.context_length} ctx")
+        return ", ".join(parts)
+
+
+def parse_show(name: str, digest: str, show: dict) -> ModelInfo:
+    """Build a :class:`ModelInfo` from an ``/api/show`` response."""
+    details = show.get("details") or {}
+    model_info = show.get("model_info") or {}
+    families = details.get("families") or []
+    arch = model_info.get("general.architecture", "")
+    vision = (
+        "vision" in (show.get("capabilities") or [])
+        or bool(show.get("projector_info"))
+        or bool(_VISION_FAMILIES & set(families))
+        or any(".vision." in key for key in model_info)
+    )
+    return ModelInfo(
+        name=name,
+        digest=digest,
+        vision=vision,
+        context_length=model_info.get(f"{arch}.context_length"),
+        parameter_size=details.get("parameter_size", ""),
+        quantization=details.get("quantization_level", ""),
+        families=list(families),
+    )
+
+
+class ModelRegistry:
+    def __init__(self, cache_path: Optional[str] = MODEL_CACHE_PATH):
+        self.cache_path = cache_path
+        self._by_digest: Dict[str, ModelInfo] = {}
+        self._names: Dict[str, str] = {}  # model name -> digest (or "name:<name>" when Ollama gave none)
+        self._lock = threading.Lock()
+        self._load()
+
+    def refresh(self) -> List[ModelInfo]:
+        """Sync with ``/api/tags``; only models with a new digest hit ``/api/show``."""
+        tags = list_models()
+        names: Dict[str, str] = {}
+        fetched = False
+        for tag in tags:
+            name, digest = tag.get("name", ""), tag.get("digest", "")
+            if not name:
+                continue
+            # Tags that share weights (llava:latest, llava:7b) share one entry; get() and
+            # models() hand out a copy under each tag's own name
+            key = digest or f"name:{name}"
+            names[name] = key
+            with self._lock:
+                known = self._by_digest.get(key)
+            if known is not None and digest:
+                continue
+            try:
+                info = parse_show(name, digest, show_model(name))
+            except Exception as exc:
+                logger.warning("Could not inspect model %s: %s", name, exc)
+                continue
+            logger.info("Model %s: %s", name, info.summary())
+            with self._lock:
+                self._by_digest[key] = info
+            fetched = True
+        with self._lock:
+            self._names = names
+        if fetched:
+            self._save()
+        return self.models()
+
+    def models(self) -> List[ModelInfo]:
+        """One entry per installed tag, in ``/api/tags`` order."""
+        with self._lock:
+            return [
+                ModelInfo(**{**asdict(self._by_digest[key]), "name": name})
+                for name, key in self._names.items()
+                if key in self._by_digest
+            ]
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        with self._lock:
+            key = self._names.get(name)
+            info = self._by_digest.get(key) if key is not None else None
+        return ModelInfo(**{**asdict(info), "name": name}) if info else None
+
+    def route(self, requested: str, needs_vision: bool) -> str:
+        """Return *requested* if it can serve the job, else the first installed model that can.
+
+        Unknown models (e.g. the registry could not inspect them) are passed
+        through unchanged rather than blocked.
+
+        Raises
+        ------
+        ValueError
+            If the job needs vision and no installed model supports it.
+        """
+        if not needs_vision:
+            return requested
+        info = self.get(requested)
+        if info is None or info.vision:
+            return requested
+        for candidate in self.models():
+            if candidate.vision:
+                return candidate.name
+        raise ValueError(f"{requested} cannot read images and no vision-capable model is installed.")
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as fh:
+                entries = json.load(fh)
+            self._by_digest = {e["digest"]: ModelInfo(**e) for e in entries if e.get("digest")}
+        except Exception as exc:
+            logger.warning("Ignoring unreadable model cache %s: %s", self.cache_path, exc)
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with self._lock:
+                entries = [asdict(info) for info in self._by_digest.values()]
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(entries, fh, indent=1)
+            os.replace(tmp, self.cache_path)
+        except OSError as exc:
+            logger.warning("Could not write model cache %s: %s", self.cache_path, exc)
+
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,123 @@
+"""Animated GIF / multi-frame image support.
+
+Instead of describing only the first frame, a bounded set of key frames is
+sampled (near-identical consecutive frames are skipped), the frames are sent
+to Ollama concurrently and the per-frame descriptions are merged into one.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageSequence
+
+from constants import FRAME_CONCURRENCY, FRAME_MIN_DISTANCE, IMAGE_OPTIONS, MAX_FRAMES
+from descriptions import clean_response, merge_descriptions
+from generation import GenerationPolicy, run_generation
+from image_hash import dhash, hamming
+from imaging import downscale, encode_for_budget, to_base64
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Compare at most this many candidate frames per requested key frame. Skipped
+# frames are still stepped through (GIF and APNG frames build on the previous
+# one), but they are not converted, hashed or compared.
+_CANDIDATES_PER_FRAME = 8
+# Formats whose extra frames are animation. MPO (camera JPEGs) and multi-page
+# TIFF also report several frames, but those are stereo pairs, depth maps or pages.
+_ANIMATED_FORMATS = {"GIF", "PNG", "WEBP"}
+
+
+def frame_count(image_path: str | Path) -> int:
+    with Image.open(image_path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def is_animation(image_path: str | Path) -> bool:
+    """True for animated GIF, APNG and WebP; single-frame and MPO/TIFF files are not animations."""
+    with Image.open(image_path) as img:
+        return img.format in _ANIMATED_FORMATS and getattr(img, "is_animated", False)
+
+
+def sample_key_frames(
+    image_path: str | Path, max_frames: int = MAX_FRAMES, min_distance: int = FRAME_MIN_DISTANCE
+) -> List[Tuple[int, Image.Image]]:
+    """Return up to *max_frames* ``(index, rgb_frame)`` pairs that differ visibly.
+
+    Long animations are first strided down to a bounded number of candidates;
+    a candidate is kept only if its dHash is more than *min_distance* bits from
+    the previously kept frame. If more frames survive than *max_frames*, an
+    evenly spaced subset (always including the first) is returned.
+    """
+    with Image.open(image_path) as img:
+        total = getattr(img, "n_frames", 1)
+        stride = max(1, total // (max_frames * _CANDIDATES_PER_FRAME))
+        kept: List[Tuple[int, Image.Image]] = []
+        last_hash = None
+        for index, frame in enumerate(ImageSequence.Iterator(img)):
+            if index % stride:
+                continue
+            with span("decode", frame=index):
+                rgb = frame.convert("RGB")
+            h = dhash(rgb)
+            if last_hash is not None and hamming(h, last_hash) <= min_distance:
+                continue
+            kept.append((index, rgb))
+            last_hash = h
+
+    if len(kept) > max_frames:
+        step = len(kept) / max_frames
+        kept = [kept[int(i * step)] for i in range(max_frames)]
+    return kept
+
+
+def describe_frames(
+    image_path: str | Path,
+    model_name: str,
+    prompt: str,
+    max_frames: int = MAX_FRAMES,
+    concurrency: int = FRAME_CONCURRENCY,
+    policy: Optional[GenerationPolicy] = None,
+) -> Tuple[str, dict]:
+    """Describe an animation from its key frames.
+
+    Returns ``(merged_description, report)`` where the report holds the frame
+    counts and per-stage latencies.
+    """
+    start = time.perf_counter()
+    with span("sample_frames", path=str(image_path)):
+        frames = sample_key_frames(image_path, max_frames)
+    total = frame_count(image_path)
+    sample_s = time.perf_counter() - start
+
+    frame_prompt = f"{prompt}\n\nThis is one frame of an animation; describe what is visible in it."
+
+    def describe(item: Tuple[int, Image.Image]) -> Tuple[int, str, float]:
+        index, frame = item
+        t0 = time.perf_counter()
+        with span("describe_frame", frame=index):
+            image_b64 = to_base64(encode_for_budget(downscale(frame))["data"])
+            result = run_generation(model_name, frame_prompt, IMAGE_OPTIONS, images=[image_b64], policy=policy)
+            with span("clean"):
+                text = clean_response(result["response"])
+        return index, text, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="frame") as pool:
+        results = sorted(pool.map(describe, frames))
+
+    with span("merge", frames=len(results)):
+        merged = merge_descriptions(text for _, text, _ in results)
+
+    report = {
+        "frames_total": total,
+        "frames_sampled": len(frames),
+        "frame_indices": [index for index, _, _ in results],
+        "sample_s": round(sample_s, 3),
+        "per_frame_s": [round(seconds, 3) for _, _, seconds in results],
+        "wall_s": round(time.perf_counter() - start, 3),
+    }
+    logger.info("Described %s from %d/%d frames: %s", image_path, len(frames), total, report)
+    return merged, report
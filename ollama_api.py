@@ -1,9 +1,23 @@
+import itertools
+import json
+import logging
 import os
+import time
 import requests
-from typing import Tuple, List, Union
+from typing import Callable, Tuple, List, Optional, Union
+
+from resilience import CircuitBreaker, OllamaHTTPError, RetryBudget, RetryPolicy, call_with_retry
+from tracing import span
+
+logger = logging.getLogger(__name__)
 
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 
+# (connect, read) seconds for /api/generate. The read timeout is the longest gap
+# between streamed chunks, so it must cover a model load plus prompt evaluation.
+GENERATE_TIMEOUT = (10, 300)
+
+
 def check_ollama() -> Tuple[bool, Union[str, List[str]]]:
     """Check if Ollama is running and return available model names.
 
@@ -32,8 +46,9 @@ def check_ollama() -> Tuple[bool, Union[str, List[str]]]:
 def get_available_models(timeout: int = 2) -> list[str]:
     """Return a list of model names available in Ollama. Empty list if none or error."""
     try:
-        resp = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=timeout)
-        print("[DEBUG] Ollama /api/tags response:", resp.text)
+        with span("api_tags", cat="poll"):
+            resp = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=timeout)
+        logger.debug("Ollama /api/tags response: %s", resp.text)
         if resp.status_code != 200:
             return []
         data = resp.json()
@@ -42,11 +57,195 @@ def get_available_models(timeout: int = 2) -> list[str]:
         if isinstance(models, dict):
             models = [models]
         if not isinstance(models, list):
-            print("[DEBUG] Unexpected models type:", type(models))
+            logger.debug("Unexpected models type: %s", type(models))
             return []
         names = [m.get("name", "") for m in models if isinstance(m, dict) and m.get("name")]
-        print("[DEBUG] Parsed model names:", names)
+        logger.debug("Parsed model names: %s", names)
         return names
     except Exception as e:
-        print("[DEBUG] Ollama get_available_models error:", e)
-        return [] 
\ No newline at end of file
+        logger.debug("Ollama get_available_models error: %s", e)
+        return []
+
+
+
+def list_models(timeout: float = 5) -> List[dict]:
+    """Return the raw ``/api/tags`` model entries (name, digest, details, ...)."""
+    resp = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=timeout)
+    if resp.status_code != 200:
+        raise OllamaHTTPError(resp.status_code, resp.text)
+    models = resp.json().get("models", [])
+    if isinstance(models, dict):
+        models = [models]
+    return [m for m in models if isinstance(m, dict)]
+
+
+def show_model(name: str, timeout: float = 10) -> dict:
+    """Return ``/api/show`` details for one model."""
+    resp = requests.post(f"{OLLAMA_BASE_URL}/api/show", json={"model": name}, timeout=timeout)
+    if resp.status_code != 200:
+        raise OllamaHTTPError(resp.status_code, resp.text)
+    return resp.json()
+
+def running_models(timeout: float = 2) -> List[dict]:
+    """Return the ``/api/ps`` entries for models currently loaded in memory."""
+    with span("api_ps", cat="poll"):
+        resp = requests.get(f"{OLLAMA_BASE_URL}/api/ps", timeout=timeout)
+    if resp.status_code != 200:
+        raise OllamaHTTPError(resp.status_code, resp.text)
+    return [m for m in resp.json().get("models") or [] if isinstance(m, dict)]
+
+def check_health(timeout: float = 2) -> bool:
+    """Return True if Ollama answers ``/api/version``."""
+    try:
+        return requests.get(f"{OLLAMA_BASE_URL}/api/version", timeout=timeout).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+# Shared by every generate call in the process
+RETRY_POLICY = RetryPolicy()
+RETRY_BUDGET = RetryBudget()
+CIRCUIT_BREAKER = CircuitBreaker(check_health)
+
+
+def generate(
+    model: str,
+    prompt: str,
+    images: Optional[List[str]] = None,
+    options: Optional[dict] = None,
+    timeout: Union[float, Tuple[float, float], None] = GENERATE_TIMEOUT,
+    should_stop: Optional[Callable[[str, int], bool]] = None,
+) -> dict:
+    """Run an ``/api/generate`` request and return the final response body.
+
+    The request is streamed so time to first token can be traced, but the
+    result has the same shape as a non-streaming response: the final chunk
+    (durations, ``eval_count``, ...) with ``response`` holding the full text.
+    *should_stop* enables client-side early termination; see :func:`_read_stream`.
+    *timeout* bounds connecting and every wait for the next chunk, so a hung or
+    half-open server raises a (retryable) timeout instead of blocking forever.
+    Transient failures (connection errors, timeouts, 502/503/504 while a model
+    loads) are retried with backoff; see :mod:`resilience`. The body also gets
+    client-side timings of the attempt that succeeded (``client_s``,
+    ``client_first_chunk_s``) and ``attempts``, so callers can tell retry
+    backoff apart from time spent on the server.
+
+    Raises
+    ------
+    OllamaHTTPError
+        If Ollama answers with a non-200 status that is not worth retrying, or retries run out.
+    CircuitOpenError
+        If Ollama has been failing and has not passed a health check since.
+    """
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    if images:
+        payload["images"] = images
+    if options:
+        payload["options"] = options
+
+    attempts = 0
+
+    def post() -> dict:
+        nonlocal attempts
+        attempts += 1
+        sent = time.monotonic()
+        with span("http_send", cat="http", model=model):
+            resp = requests.post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                timeout=timeout,
+                stream=True,
+            )
+        with resp:
+            if resp.status_code != 200:
+                raise OllamaHTTPError(resp.status_code, resp.text)
+            result = _read_stream(resp, should_stop, sent)
+        result["client_s"] = time.monotonic() - sent
+        return result
+
+    result = call_with_retry(post, RETRY_POLICY, RETRY_BUDGET, CIRCUIT_BREAKER)
+    result["attempts"] = attempts
+    return result
+
+
+def warm_model(model: str, keep_alive: Optional[str] = None, timeout: float = 120) -> bool:
+    """Ask Ollama to load *model* into memory (an empty generate request). Returns success.
+
+    Without *keep_alive* the server's own ``OLLAMA_KEEP_ALIVE`` decides how long it stays loaded.
+    """
+    body = {"model": model}
+    if keep_alive is not None:
+        body["keep_alive"] = keep_alive
+    try:
+        with span("warm_model", cat="http", model=model):
+            resp = requests.post(f"{OLLAMA_BASE_URL}/api/generate", json=body, timeout=timeout)
+        return resp.status_code == 200
+    except requests.exceptions.RequestException as exc:
+        logger.debug("Warming %s failed: %s", model, exc)
+        return False
+
+
+def embed(model: str, text: str, timeout: Optional[float] = 30) -> List[float]:
+    """Return the embedding of *text*, using ``/api/embed`` or the older ``/api/embeddings``."""
+
+    def post() -> List[float]:
+        with span("embed", cat="http", model=model):
+            resp = requests.post(f"{OLLAMA_BASE_URL}/api/embed", json={"model": model, "input": text}, timeout=timeout)
+            if resp.status_code == 404 and "model" not in resp.text.lower():
+                # Ollama before 0.3 only has the legacy endpoint
+                resp = requests.post(
+                    f"{OLLAMA_BASE_URL}/api/embeddings", json={"model": model, "prompt": text}, timeout=timeout
+                )
+                if resp.status_code != 200:
+                    raise OllamaHTTPError(resp.status_code, resp.text)
+                return resp.json()["embedding"]
+            if resp.status_code != 200:
+                raise OllamaHTTPError(resp.status_code, resp.text)
+            return resp.json()["embeddings"][0]
+
+    return call_with_retry(post, RETRY_POLICY, RETRY_BUDGET, CIRCUIT_BREAKER)
+
+
+def _read_stream(
+    resp: requests.Response,
+    should_stop: Optional[Callable[[str, int], bool]] = None,
+    sent: Optional[float] = None,
+) -> dict:
+    """Collect a streamed ``/api/generate`` response into one body.
+
+    If *should_stop* returns True for the text so far (and the number of
+    chunks, roughly tokens, received), the connection is dropped, which makes
+    Ollama abort the generation. The body then has ``done_reason`` set to
+    ``"client_stop"`` and ``eval_count`` set to the chunks received. With
+    *sent* (``time.monotonic()`` when the request went out) the body also
+    gets ``client_first_chunk_s``, measured here even when the server's
+    durations are missing because the stream was cut short.
+    """
+    parts: List[str] = []
+    final: dict = {}
+    chunks = 0
+    lines = resp.iter_lines()
+    with span("ttfb", cat="http"):
+        first = next(lines, b"")
+    first_chunk_s = time.monotonic() - sent if sent is not None else None
+    with span("generation", cat="http") as sp:
+        for line in itertools.chain([first], lines):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done", True):
+                final = chunk
+                break
+            chunks += 1
+            if should_stop is not None and should_stop("".join(parts), chunks):
+                final = {"done": False, "done_reason": "client_stop", "eval_count": chunks}
+                break
+        sp.set(eval_count=final.get("eval_count", 0), done_reason=final.get("done_reason", ""))
+    final["response"] = "".join(parts)
+    if first_chunk_s is not None:
+        final["client_first_chunk_s"] = first_chunk_s
+    return final
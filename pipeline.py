@@ -0,0 +1,478 @@
+"""Bulk image description: a process pool prepares payloads while I/O threads keep Ollama busy.
+
+Decode/resize/encode is CPU bound and holds the GIL, so it runs in worker
+processes. Prepared payloads flow through a bounded queue (backpressure: the
+producer blocks once ``queue_size`` payloads are waiting) to a set of I/O
+threads that each keep one ``/api/generate`` request in flight. Animations skip
+the pool and are described from their key frames
+(:func:`~multiframe.describe_frames`); with ``--tiles`` large images are
+described from a global view plus native-resolution crops
+(:func:`~tiling.describe_tiled`). Either way one image holds one limiter slot. With
+``--adaptive`` the number of requests in flight is tuned at runtime by an
+:class:`~concurrency.AIMDLimiter` instead of being fixed. Jobs may name
+different models (``--jobs``); a :class:`~scheduler.ResidencyScheduler` orders
+them so models already loaded in Ollama go first and swaps are avoided.
+
+Usage::
+
+    python pipeline.py photos/ --model llava --out results.jsonl
+    python pipeline.py --jobs jobs.jsonl --model llava   # {"path": ..., "model": ...} per line
+    python pipeline.py photos/ --model llava --out results.jsonl --journal job.journal
+    python pipeline.py photos/ --model llava --tiles 4   # high-detail tiled mode
+    python pipeline.py --resume job.journal              # after a crash: only unfinished images
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from concurrency import AIMDLimiter
+from constants import DEFAULT_PROMPT, DUPLICATE_MAX_DISTANCE, IMAGE_EXTENSIONS, IMAGE_OPTIONS, TILE_CONCURRENCY
+from descriptions import clean_response
+from generation import POLICIES, get_policy, policy_report, run_generation
+from image_hash import DUPLICATE_INDEX
+from imaging import EncodeStats, prepare_image_payload
+from journal import BatchJournal
+from model_registry import MODEL_REGISTRY
+from multiframe import describe_frames, is_animation
+from scheduler import ResidencyScheduler
+from tiling import describe_tiled
+from tracing import TRACER, span
+
+_DONE = object()
+
+
+def _prepare(path: str) -> dict:
+    """Pool task: the still-image payload, or just a marker for an animation."""
+    if is_animation(path):
+        return {"path": path, "animated": True, "prepare_s": 0.0}
+    return prepare_image_payload(path)
+
+
+class StageStats:
+    """Busy/wait accounting for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_s = 0.0
+        self.wait_s = 0.0
+        self.limiter_wait_s = 0.0  # blocked on a concurrency-limiter slot; neither busy nor starved
+        self._lock = threading.Lock()
+
+    def add_busy(self, seconds: float):
+        with self._lock:
+            self.items += 1
+            self.busy_s += seconds
+
+    def add_wait(self, seconds: float):
+        with self._lock:
+            self.wait_s += seconds
+
+    def add_limiter_wait(self, seconds: float):
+        with self._lock:
+            self.limiter_wait_s += seconds
+
+    def report(self, wall_s: float) -> dict:
+        capacity = wall_s * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_s": round(self.busy_s, 3),
+            "wait_s": round(self.wait_s, 3),
+            "limiter_wait_s": round(self.limiter_wait_s, 3),
+            "utilisation": round(self.busy_s / capacity, 3) if capacity else 0.0,
+        }
+
+
+class BatchPipeline:
+    """Describe many images, overlapping CPU preparation and GPU inference.
+
+    *model_name* is the default model; jobs passed as ``(path, model)`` use their own.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        prompt: str = DEFAULT_PROMPT,
+        prepare_workers: Optional[int] = None,
+        io_workers: int = 2,
+        queue_size: int = 8,
+        limiter: Optional[AIMDLimiter] = None,
+        policy: Optional[str] = None,
+        tiles: int = 0,
+        tile_concurrency: int = TILE_CONCURRENCY,
+    ):
+        self.model_name = model_name
+        self.policy = get_policy(policy)
+        self.prompt = prompt or DEFAULT_PROMPT
+        self.tiles = tiles if tiles >= 2 else 0
+        self.tile_concurrency = tile_concurrency
+        # Duplicate-index key: a description cut short by one policy, or made
+        # from tiles, must not serve another
+        self._cache_prompt = f"{self.prompt}\n[policy:{self.policy.name}]"
+        if self.tiles:
+            self._cache_prompt += f"\n[tiled:{self.tiles}]"
+        self.prepare_workers = prepare_workers or max(1, (os.cpu_count() or 2) - 1)
+        # With a limiter, run enough I/O threads for its ceiling and let it gate them
+        self.limiter = limiter
+        self.io_workers = limiter.max_limit if limiter else io_workers
+        self.queue_size = queue_size
+
+    def run(
+        self,
+        image_paths: Iterable[Union[str, Tuple[str, str]]],
+        on_result: Optional[Callable[[dict], None]] = None,
+        on_start: Optional[Callable[[str, str], None]] = None,
+    ) -> dict:
+        """Process *image_paths* (paths or ``(path, model)`` pairs) and return a stage utilisation report.
+
+        *on_result* is called once per image (serialised, from I/O threads) with
+        ``{"path", "model", "description", "error", "prepare_s", "payload_bytes", "limiter_wait_s", "generate_s",
+        "duplicate_of"}``. ``generate_s`` starts once a limiter slot is held; the wait for one is ``limiter_wait_s``.
+        *on_start* is called with ``(path, model)`` when an I/O thread picks an image up.
+        """
+        scheduler = ResidencyScheduler()
+        for job in image_paths:
+            path, model = (job, self.model_name) if isinstance(job, (str, Path)) else job
+            scheduler.put(str(path), model)
+        scheduler.close()
+
+        prepare_stats = StageStats("prepare", self.prepare_workers)
+        generate_stats = StageStats("generate", self.io_workers)
+        encode_stats = EncodeStats()
+        payloads: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        result_lock = threading.Lock()
+        counts = {"ok": 0, "failed": 0, "duplicates": 0}
+
+        def emit(result: dict):
+            with result_lock:
+                if result["error"]:
+                    counts["failed"] += 1
+                elif result["duplicate_of"]:
+                    counts["duplicates"] += 1
+                else:
+                    counts["ok"] += 1
+                if on_result is not None:
+                    on_result(result)
+
+        def put(item):
+            start = time.perf_counter()
+            payloads.put(item)
+            prepare_stats.add_wait(time.perf_counter() - start)
+
+        def collect(path: str, model: str, future) -> dict:
+            try:
+                item = future.result()
+            except Exception as exc:
+                return {"path": path, "model": model, "error": f"prepare failed: {exc}"}
+            TRACER.extend(item.pop("trace_events", ()))
+            prepare_stats.add_busy(item["prepare_s"])
+            if not item.get("animated"):
+                encode_stats.add(item)
+            item["model"] = model
+            return item
+
+        def produce():
+            # Keep a few more jobs in the pool than it has workers so it never idles,
+            # but hand results over in submission order through the bounded queue.
+            try:
+                with ProcessPoolExecutor(max_workers=self.prepare_workers) as pool:
+                    pending: deque = deque()
+                    while (job := scheduler.get()) is not None:
+                        path, model = job
+                        pending.append((path, model, pool.submit(_prepare, path)))
+                        if len(pending) >= self.prepare_workers * 2:
+                            put(collect(*pending.popleft()))
+                    while pending:
+                        put(collect(*pending.popleft()))
+            finally:
+                for _ in range(self.io_workers):
+                    payloads.put(_DONE)
+
+        def consume():
+            while True:
+                start = time.perf_counter()
+                item = payloads.get()
+                generate_stats.add_wait(time.perf_counter() - start)
+                if item is _DONE:
+                    return
+                if on_start is not None:
+                    on_start(item["path"], item["model"])
+                with span("describe_image", path=item["path"], model=item["model"]):
+                    result = self._describe(item, generate_stats)
+                emit(result)
+
+        wall_start = time.perf_counter()
+        threads = [threading.Thread(target=produce, name="pipeline-producer", daemon=True)]
+        threads += [
+            threading.Thread(target=consume, name=f"pipeline-io-{i}", daemon=True) for i in range(self.io_workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall_s = time.perf_counter() - wall_start
+
+        stages = {s.name: s.report(wall_s) for s in (prepare_stats, generate_stats)}
+        report = {
+            "wall_s": round(wall_s, 3),
+            **counts,
+            "stages": stages,
+            "bottleneck": _bottleneck(stages),
+            "encoding": encode_stats.report(),
+            "scheduler": scheduler.stats(),
+        }
+        if self.limiter is not None:
+            report["concurrency"] = self.limiter.metrics()
+        report["generation"] = policy_report()
+        return report
+
+    def _describe(self, item: dict, stats: StageStats) -> dict:
+        model = item["model"]
+        result = {
+            "path": item["path"],
+            "model": model,
+            "description": "",
+            "error": item.get("error", ""),
+            "prepare_s": item.get("prepare_s", 0.0),
+            "payload_bytes": item.get("payload_bytes", 0),
+            "limiter_wait_s": 0.0,
+            "generate_s": 0.0,
+            "duplicate_of": "",
+        }
+        if result["error"]:
+            return result
+        if item.get("animated"):
+            return self._describe_animation(item, result, stats)
+
+        match = DUPLICATE_INDEX.lookup(item["hash"], model, self._cache_prompt, DUPLICATE_MAX_DISTANCE)
+        if match is not None:
+            result["description"] = match[1]["description"]
+            result["duplicate_of"] = match[1]["path"]
+            return result
+
+        requested = time.perf_counter()
+        start = None
+        try:
+            with self.limiter.slot() if self.limiter else nullcontext() as slot:
+                start = time.perf_counter()
+                result["limiter_wait_s"] = start - requested
+                if self.tiles:
+                    # The prepared payload doubles as the global view; only big images are re-decoded
+                    result["description"], report = describe_tiled(
+                        item["path"], model, self.prompt, self.tiles, self.tile_concurrency, self.policy,
+                        global_b64=item["image_b64"],
+                    )
+                    result["tiles"] = report["tiles"]
+                else:
+                    response = run_generation(
+                        model, self.prompt, IMAGE_OPTIONS, images=[item["image_b64"]], policy=self.policy
+                    )
+                    if slot is not None:
+                        slot.observe(response)
+            if not self.tiles:
+                with span("clean"):
+                    result["description"] = clean_response(response["response"])
+            DUPLICATE_INDEX.add(item["hash"], model, self._cache_prompt, item["path"], result["description"])
+        except Exception as exc:
+            result["error"] = str(exc)
+        finally:
+            if start is not None:
+                result["generate_s"] = time.perf_counter() - start
+                stats.add_busy(result["generate_s"])
+            stats.add_limiter_wait(result["limiter_wait_s"])
+        return result
+
+    def _describe_animation(self, item: dict, result: dict, stats: StageStats) -> dict:
+        """Describe an animation from its key frames; the frames share one limiter slot."""
+        requested = time.perf_counter()
+        start = None
+        try:
+            with self.limiter.slot() if self.limiter else nullcontext():
+                start = time.perf_counter()
+                result["limiter_wait_s"] = start - requested
+                result["description"], report = describe_frames(
+                    item["path"], item["model"], self.prompt, policy=self.policy
+                )
+            result["frames"] = report["frames_sampled"]
+        except Exception as exc:
+            result["error"] = str(exc)
+        finally:
+            if start is not None:
+                result["generate_s"] = time.perf_counter() - start
+                stats.add_busy(result["generate_s"])
+            stats.add_limiter_wait(result["limiter_wait_s"])
+        return result
+
+
+def _bottleneck(stages: dict) -> str:
+    """Name the stage that limits throughput.
+
+    If I/O threads spend most of their time waiting for payloads the CPU side is
+    too slow; if the producer spends its time blocked on a full queue the server is.
+    """
+    prepare, gen = stages["prepare"], stages["generate"]
+    if gen["wait_s"] > prepare["wait_s"]:
+        return "prepare (CPU)"
+    return "generate (Ollama/GPU)"
+
+
+def iter_image_paths(inputs: Iterable[str]) -> List[str]:
+    """Expand files and directories into a sorted list of image paths."""
+    paths: List[str] = []
+    for entry in inputs:
+        p = Path(entry)
+        if p.is_dir():
+            paths.extend(str(f) for f in sorted(p.rglob("*")) if f.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            paths.append(str(p))
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Describe many images with Ollama.")
+    parser.add_argument("inputs", nargs="*", help="image files or directories")
+    parser.add_argument("--model", help="Ollama vision model name (default for --jobs entries)")
+    parser.add_argument("--jobs", metavar="FILE", help='JSONL of {"path": ..., "model": ...} jobs, mixed models allowed')
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--out", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--prepare-workers", type=int, default=None)
+    parser.add_argument("--io-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--adaptive", action="store_true", help="tune requests in flight automatically (AIMD)")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="ceiling for --adaptive")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default=None, help="generation-length policy")
+    parser.add_argument("--tiles", type=int, default=0,
+                        help="high-detail mode: describe large images from a global view plus this many crops")
+    parser.add_argument("--tile-concurrency", type=int, default=TILE_CONCURRENCY,
+                        help="views of one tiled image described at once")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome/Perfetto trace of every stage to FILE")
+    parser.add_argument("--journal", metavar="FILE", help="record progress in FILE so the job can be resumed")
+    parser.add_argument("--resume", metavar="FILE", help="finish the job recorded in this journal")
+    args = parser.parse_args(argv)
+    if not args.model and not args.resume:
+        parser.error("--model is required unless resuming")
+    if args.resume and (args.inputs or args.jobs or args.journal):
+        parser.error("--resume takes its images and settings from the journal")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.trace:
+        # Worker processes read the variable on import
+        os.environ["OLLAMA_IMAGE_TRACE"] = args.trace
+        TRACER.enable()
+
+    journal: Optional[BatchJournal] = None
+    if args.resume:
+        try:
+            journal = BatchJournal.open(args.resume)
+        except (OSError, ValueError) as exc:
+            parser.error(f"cannot resume {args.resume}: {exc}")
+        meta = journal.meta
+        args.model, args.prompt, args.policy = meta["model"], meta["prompt"], meta.get("policy")
+        args.tiles, args.tile_concurrency = meta.get("tiles", 0), meta.get("tile_concurrency", TILE_CONCURRENCY)
+        args.out = meta.get("out", "-")
+        if args.out != "-":
+            restored, recovered = journal.reconcile_output(args.out)
+            if restored or recovered:
+                logging.info("%s: restored %d results from the journal, recovered %d written results",
+                             args.out, restored, recovered)
+        jobs = journal.pending()
+        logging.info("Resuming %s: %d of %d images left", args.resume, len(jobs), len(journal.jobs))
+        return _run_jobs(args, jobs, args.model, journal, out_mode="a")
+
+    jobs: List[Tuple[str, str]] = [(path, args.model) for path in iter_image_paths(args.inputs)]
+    if args.jobs:
+        with open(args.jobs, encoding="utf-8") as fh:
+            entries = [json.loads(line) for line in fh if line.strip()]
+        jobs += [(e["path"], e.get("model") or args.model) for e in entries]
+    if not jobs:
+        parser.error("no images given (pass files, directories or --jobs)")
+
+    routes = {}
+    try:
+        MODEL_REGISTRY.refresh()
+        for requested in dict.fromkeys(model for _, model in jobs):
+            routes[requested] = MODEL_REGISTRY.route(requested, needs_vision=True)
+    except ValueError as exc:
+        parser.error(str(exc))
+    except Exception as exc:
+        logging.warning("Could not check model capabilities: %s", exc)
+    for requested, model in routes.items():
+        if model != requested:
+            logging.warning("%s cannot read images; using %s instead", requested, model)
+    jobs = [(path, routes.get(model, model)) for path, model in jobs]
+    default_model = routes.get(args.model, args.model)
+
+    if args.journal:
+        # Absolute paths in the journal and the output, so --resume works from any directory
+        jobs = [(str(Path(path).resolve()), model) for path, model in jobs]
+        # Resume reconciles the journal with --out, so old results there would pass as this job's
+        if args.out != "-" and os.path.exists(args.out) and os.path.getsize(args.out):
+            parser.error(f"{args.out} is not empty; choose a new --out for a journaled job")
+        meta = {
+            "model": default_model,
+            "prompt": args.prompt,
+            "policy": args.policy,
+            "tiles": args.tiles,
+            "tile_concurrency": args.tile_concurrency,
+            "out": args.out if args.out == "-" else os.path.abspath(args.out),
+        }
+        try:
+            journal = BatchJournal.create(args.journal, jobs, meta)
+        except FileExistsError:
+            parser.error(f"{args.journal} already exists; use --resume {args.journal} to continue it")
+    return _run_jobs(args, jobs, default_model, journal, out_mode="w")
+
+
+def _run_jobs(args: argparse.Namespace, jobs: List[Tuple[str, str]], default_model: str,
+              journal: Optional[BatchJournal], out_mode: str) -> int:
+    """Run *jobs* and write results to ``args.out``: truncated for a new run, appended on resume."""
+    out = sys.stdout if args.out == "-" else open(args.out, out_mode, encoding="utf-8")
+    try:
+        pipeline = BatchPipeline(
+            default_model,
+            args.prompt,
+            prepare_workers=args.prepare_workers,
+            io_workers=args.io_workers,
+            queue_size=args.queue_size,
+            limiter=AIMDLimiter(initial=args.io_workers, max_limit=args.max_in_flight) if args.adaptive else None,
+            policy=args.policy,
+            tiles=args.tiles,
+            tile_concurrency=args.tile_concurrency,
+        )
+
+        def write(result: dict):
+            # Output first: a result that reached the file is reused on resume even
+            # if its journal record was lost
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if journal is not None:
+                journal.record_result(result)
+
+        report = pipeline.run(jobs, on_result=write, on_start=journal.record_start if journal else None)
+        if journal is not None:
+            report["journal"] = journal.stats()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if journal is not None:
+            journal.close()
+        if args.trace:
+            TRACER.export_chrome(args.trace)
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
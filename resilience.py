@@ -0,0 +1,191 @@
+"""Retry with jittered backoff, a shared retry budget and a circuit breaker for Ollama calls.
+
+Only failures that are likely to go away on their own are retried: connection
+resets/refusals, timeouts and the HTTP statuses Ollama returns while a model is
+loading or the server is overloaded. Everything else (unknown model, bad
+request, ...) fails immediately.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 429, 502, 503, 504})
+
+
+class OllamaHTTPError(RuntimeError):
+    """Non-200 answer from Ollama."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Ollama returned {status_code}: {text}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Ollama while the circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Classify *exc* as transient (worth retrying) or permanent."""
+    if isinstance(exc, OllamaHTTPError):
+        return exc.status_code in RETRYABLE_STATUS
+    return isinstance(
+        exc,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    )
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and total elapsed time."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0, deadline: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number *attempt* (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent requests so an outage can't multiply load.
+
+    Over a sliding *window* seconds, retries may not exceed
+    ``max(min_retries, ratio * requests)``.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 5, window: float = 30.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        for q in (self._requests, self._retries):
+            while q and now - q[0] > self.window:
+                q.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Reserve one retry; False when the budget is exhausted."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= max(self.min_retries, self.ratio * len(self._requests)):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """Fail fast while the server is down.
+
+    After *failure_threshold* consecutive transient failures the circuit opens
+    and calls raise :class:`CircuitOpenError` without touching the network.
+    Once *reset_timeout* has passed, the next call runs the health *probe*; if
+    it succeeds the circuit closes again, otherwise it stays open for another
+    *reset_timeout*.
+    """
+
+    CLOSED, OPEN = "closed", "open"
+
+    def __init__(self, probe: Callable[[], bool], failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Ollama is unavailable; not retrying until it answers a health check.")
+            # Hold the lock while probing so concurrent callers don't all probe at once
+            try:
+                healthy = self.probe()
+            except Exception:
+                healthy = False
+            if not healthy:
+                self._opened_at = time.monotonic()
+                raise CircuitOpenError("Ollama is still unavailable (health check failed).")
+            logger.info("Ollama health check passed; closing circuit")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.CLOSED and self._failures >= self.failure_threshold:
+                logger.warning("Opening circuit after %d consecutive Ollama failures", self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    policy: RetryPolicy,
+    budget: Optional[RetryBudget] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> T:
+    """Call *fn*, retrying transient failures per *policy*, *budget* and *breaker*."""
+    start = time.monotonic()
+    if budget is not None:
+        budget.record_request()
+    attempt = 1
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = fn()
+        except Exception as exc:
+            if not is_retryable(exc):
+                if breaker is not None and isinstance(exc, OllamaHTTPError):
+                    breaker.record_success()  # the server answered, it is just a bad request
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            delay = policy.backoff(attempt)
+            if (
+                attempt >= policy.max_attempts
+                or time.monotonic() - start + delay > policy.deadline
+                or (budget is not None and not budget.try_spend())
+            ):
+                raise
+            logger.warning("Transient Ollama error (attempt %d/%d): %s; retrying in %.2fs",
+                           attempt, policy.max_attempts, exc, delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,135 @@
+"""Model-residency-aware job ordering.
+
+Ollama keeps a limited number of models in memory; a job for any other model
+evicts one and pays seconds of ``load_duration``. :class:`ResidencyScheduler`
+groups pending jobs by model, keeps dispatching the current model while it has
+work, and when it runs out prefers a model that ``/api/ps`` reports as loaded.
+It counts the model switches it made against the switches plain FIFO order
+would have made.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from ollama_api import running_models
+
+logger = logging.getLogger(__name__)
+
+
+def full_model_name(name: str) -> str:
+    """``llava`` -> ``llava:latest``, the form ``/api/ps`` reports; tagged names are unchanged."""
+    # Only the last path segment can carry a tag; "host:5000/llava" is untagged
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+class ResidencyScheduler:
+    """A blocking job queue that orders jobs to minimise model swaps.
+
+    *max_wait_s* bounds unfairness: a job that has waited that long is
+    dispatched next even if it forces a swap. ``None`` disables aging (batch
+    throughput first).
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = 2.0,
+        max_wait_s: Optional[float] = None,
+        running: Callable[[], List[dict]] = running_models,
+    ):
+        self.poll_interval = poll_interval
+        self.max_wait_s = max_wait_s
+        self._running = running
+        self._groups: "OrderedDict[str, Deque[Tuple[float, Any]]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._current: Optional[str] = None
+        self._last_put: Optional[str] = None
+        self._loaded: Set[str] = set()
+        self._loaded_at = float("-inf")
+        self._ps_failed = False
+        self._stats = {"jobs": 0, "switches": 0, "fifo_switches": 0, "loaded_picks": 0, "cold_picks": 0, "aged_picks": 0}
+
+    def put(self, job: Any, model: str):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            self._groups.setdefault(model, deque()).append((time.monotonic(), job))
+            if self._last_put is not None and model != self._last_put:
+                self._stats["fifo_switches"] += 1
+            self._last_put = model
+            self._cond.notify()
+
+    def close(self):
+        """No more jobs will be added; :meth:`get` returns ``None`` once the queue drains."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Any, str]]:
+        """Return the next ``(job, model)``, or ``None`` when closed and empty (or on timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._groups or self._closed, timeout):
+                return None
+            if not self._groups:
+                return None
+            model = self._pick()
+            group = self._groups[model]
+            _, job = group.popleft()
+            if not group:
+                del self._groups[model]
+            if self._current is not None and model != self._current:
+                self._stats["switches"] += 1
+            self._current = model
+            self._stats["jobs"] += 1
+            return job, model
+
+    def pending(self) -> Dict[str, int]:
+        with self._cond:
+            return {model: len(group) for model, group in self._groups.items()}
+
+    def loaded_models(self) -> Set[str]:
+        """Models Ollama reports as loaded (as :func:`full_model_name`), polled at most every ``poll_interval`` s."""
+        now = time.monotonic()
+        if now - self._loaded_at >= self.poll_interval:
+            self._loaded_at = now
+            try:
+                self._loaded = {
+                    full_model_name(name)
+                    for m in self._running()
+                    for name in (m.get("name"), m.get("model"))
+                    if name
+                }
+                self._ps_failed = False
+            except Exception as exc:
+                if not self._ps_failed:
+                    logger.warning("Could not poll /api/ps, scheduling by queue order only: %s", exc)
+                self._ps_failed = True
+                self._loaded = set()
+        return self._loaded
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+        stats["switches_avoided"] = max(0, stats["fifo_switches"] - stats["switches"])
+        return stats
+
+    def _pick(self) -> str:
+        """Choose the next model. Called with the lock held and at least one group pending."""
+        oldest = min(self._groups, key=lambda m: self._groups[m][0][0])
+        if self.max_wait_s is not None and oldest != self._current:
+            if time.monotonic() - self._groups[oldest][0][0] >= self.max_wait_s:
+                self._stats["aged_picks"] += 1
+                return oldest
+        if self._current in self._groups:
+            return self._current
+        # Starting a new group: only now is /api/ps worth asking
+        resident = self.loaded_models()
+        loaded = [m for m in self._groups if full_model_name(m) in resident]
+        if loaded:
+            self._stats["loaded_picks"] += 1
+            return min(loaded, key=lambda m: self._groups[m][0][0])
+        self._stats["cold_picks"] += 1
+        return oldest
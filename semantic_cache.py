@@ -0,0 +1,111 @@
+"""Embedding-based cache for text-only generations.
+
+Inputs are embedded through Ollama's embeddings endpoint and kept, together
+with the cleaned output, in a fixed-size numpy matrix. A new input whose cosine
+similarity to a stored one (for the same generation model) reaches the
+threshold reuses that output instead of running a generation.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from constants import EMBED_MODEL, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_THRESHOLD
+from ollama_api import embed
+
+logger = logging.getLogger(__name__)
+
+# After the embed model fails (e.g. it is not pulled), stop trying for a while
+_EMBED_RETRY_AFTER_S = 300
+
+
+class SemanticCache:
+    """Bounded cosine-similarity index of ``input -> output`` with LRU eviction."""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), rows L2-normalised
+        self._reset(0)
+        self._lock = threading.Lock()
+        self._embed_disabled_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _reset(self, dim: int):
+        """Drop every entry; the parallel per-row arrays must always be replaced together."""
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32) if dim else None
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._model_ids = np.full(self.max_entries, -1, dtype=np.int32)
+        self._entries: list = [None] * self.max_entries
+        self._models: dict = {}  # (model, policy) -> partition id
+        self._size = 0
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed *text* with the configured model; ``None`` if embeddings are unavailable."""
+        if time.monotonic() < self._embed_disabled_until:
+            return None
+        try:
+            vector = np.asarray(embed(EMBED_MODEL, text), dtype=np.float32)
+        except Exception as exc:
+            logger.warning("Semantic cache disabled for %ds: embedding with %s failed: %s",
+                           _EMBED_RETRY_AFTER_S, EMBED_MODEL, exc)
+            self._embed_disabled_until = time.monotonic() + _EMBED_RETRY_AFTER_S
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, model: str, vector: np.ndarray, policy: str = "default") -> Optional[Tuple[float, dict]]:
+        """Return ``(similarity, entry)`` for the closest stored input above the threshold.
+
+        Entries are partitioned by generation model and length policy: an output
+        cut short by one policy's budget is never served to another policy.
+        """
+        with self._lock:
+            model_id = self._models.get((model, policy))
+            if model_id is None or self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._vectors[: self._size] @ vector
+            scores[self._model_ids[: self._size] != model_id] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.monotonic()
+            return float(scores[best]), self._entries[best]
+
+    def add(self, model: str, vector: np.ndarray, text: str, output: str, policy: str = "default"):
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry, or the embed model changed: start over
+                self._reset(vector.shape[0])
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._model_ids[slot] = self._models.setdefault((model, policy), len(self._models))
+            self._last_used[slot] = time.monotonic()
+            self._entries[slot] = {"input": text, "output": output}
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared by all text-only workers for the lifetime of the process
+SEMANTIC_CACHE = SemanticCache()
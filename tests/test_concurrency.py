@@ -0,0 +1,83 @@
+"""AIMD limiter: increase when saturated, back off on errors and on queueing, however it is measured."""
+
+import threading
+
+from concurrency import AIMDLimiter
+
+
+def complete(limiter, response=None, ok=True, latency_s=1.0):
+    """Feed one completion without a real slot (the limiter's own bookkeeping path)."""
+    with limiter._cond:
+        limiter._in_flight += 1
+        epoch = limiter._epoch
+    limiter._complete(epoch, latency_s, ok, response or {})
+
+
+def window(limiter, response, saturate=True):
+    for _ in range(limiter.window):
+        limiter._saturated = saturate
+        complete(limiter, dict(response))
+
+
+def test_slot_blocks_at_limit():
+    limiter = AIMDLimiter(initial=1, max_limit=1)
+    entered, release = threading.Event(), threading.Event()
+
+    def second():
+        with limiter.slot():
+            entered.set()
+            release.wait(1)
+
+    with limiter.slot():
+        t = threading.Thread(target=second)
+        t.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(1)
+    assert limiter.metrics()["in_flight"] == 1
+    release.set()
+    t.join(1)
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_additive_increase_when_saturated_without_queueing():
+    limiter = AIMDLimiter(initial=2, max_limit=4, window=4)
+    window(limiter, {"client_s": 1.0, "total_duration": 1e9, "eval_count": 100})
+    assert limiter.limit == 3
+
+
+def test_hold_when_not_saturated():
+    limiter = AIMDLimiter(initial=2, max_limit=4, window=4)
+    window(limiter, {"client_s": 1.0, "total_duration": 1e9, "eval_count": 100}, saturate=False)
+    assert limiter.limit == 2 and "holding" in limiter.reason
+
+
+def test_decrease_on_server_queueing():
+    limiter = AIMDLimiter(initial=4, max_limit=8, window=4)
+    window(limiter, {"client_s": 2.0, "total_duration": 1e9, "eval_count": 100})
+    assert limiter.limit == 3 and "queued" in limiter.reason
+
+
+def test_decrease_on_errors():
+    limiter = AIMDLimiter(initial=4, max_limit=8, window=2)
+    complete(limiter, ok=False)
+    complete(limiter, {"client_s": 1.0, "total_duration": 1e9})
+    assert limiter.limit == 3
+
+
+def test_retried_attempts_count_as_errors_and_backoff_is_not_queueing():
+    limiter = AIMDLimiter(initial=4, max_limit=8, window=2)
+    # 10s in the slot, but the successful attempt took 1s: the rest was backoff
+    complete(limiter, {"client_s": 1.0, "total_duration": 1e9, "attempts": 1}, latency_s=10.0)
+    complete(limiter, {"client_s": 1.0, "total_duration": 1e9, "attempts": 3}, latency_s=10.0)
+    assert limiter.limit == 3
+    assert limiter.metrics()["queue_fraction"] == 0.0
+    assert "2 failed attempts" in limiter.reason
+
+
+def test_early_stopped_responses_use_client_first_chunk():
+    limiter = AIMDLimiter(initial=4, max_limit=8, window=4)
+    # client_stop responses have no total_duration; first chunks arrive 1.5s later than the 0.5s baseline
+    complete(limiter, {"client_s": 1.0, "client_first_chunk_s": 0.5, "done_reason": "client_stop"})
+    limiter._samples.clear()
+    window(limiter, {"client_s": 3.0, "client_first_chunk_s": 2.0, "done_reason": "client_stop"})
+    assert limiter.limit == 3 and "queued" in limiter.reason
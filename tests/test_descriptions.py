@@ -0,0 +1,27 @@
+"""Merging per-frame and per-tile descriptions into one."""
+
+from descriptions import merge_descriptions
+
+
+def test_merge_keeps_first_seen_order_and_drops_repeats():
+    merged = merge_descriptions([
+        "A woman stands on a beach. The sky is orange.",
+        "The sky is orange. A dog runs past her.",
+        "A woman stands on the beach.",
+    ])
+    assert merged == "A woman stands on a beach. The sky is orange. A dog runs past her."
+
+
+def test_merge_similarity_threshold():
+    texts = ["A red car parks by the road.", "A red car parks by the old road."]
+    assert merge_descriptions(texts, similarity=0.9) == " ".join(texts)
+    assert merge_descriptions(texts, similarity=0.5) == texts[0]
+
+
+def test_merge_ignores_empty_text_and_punctuation_only_sentences():
+    assert merge_descriptions(["", "   ", "... A cat sleeps."]) == "A cat sleeps."
+    assert merge_descriptions([]) == ""
+
+
+def test_merge_accepts_a_generator():
+    assert merge_descriptions(text for text in ["One.", "Two."]) == "One. Two."
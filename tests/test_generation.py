@@ -0,0 +1,75 @@
+"""Generation-length policies: options, budgets, early stopping and the per-policy report."""
+
+import pytest
+
+import generation
+import ollama_api
+from constants import IMAGE_OPTIONS
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from generation import (
+    POLICIES,
+    GenerationPolicy,
+    _trim_to_sentence,
+    estimate_clip_tokens,
+    get_policy,
+    policy_report,
+    run_generation,
+)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(generation, "_stats", {})
+    with FakeOllamaServer(FakeOllamaConfig(token_rate=5000, response_tokens=400)) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        yield server
+
+
+def test_estimate_clip_tokens():
+    assert estimate_clip_tokens("") == 0
+    assert estimate_clip_tokens("a red car, 4 wheels.") == 7
+    assert estimate_clip_tokens("photorealistic") == 2  # long words split into several BPE pieces
+
+
+def test_trim_to_sentence():
+    assert _trim_to_sentence("One sentence. Two sentenc") == "One sentence."
+    assert _trim_to_sentence("Short. A much longer unfinished clause") == "Short. A much longer unfinished clause"
+    assert _trim_to_sentence("no full stop") == "no full stop"
+
+
+def test_policy_options_do_not_mutate_the_base():
+    base = {"temperature": 0.7, "num_predict": 500}
+    opts = POLICIES["concise"].options(base)
+    assert opts == {"temperature": 0.7, "num_predict": 300, "stop": ["\n\n"]}
+    assert base == {"temperature": 0.7, "num_predict": 500}
+    assert "stop" not in POLICIES["default"].options(base)
+
+
+def test_should_stop_on_budgets():
+    tokens = GenerationPolicy("t", token_budget=3)
+    assert not tokens.should_stop("a b", 2) and tokens.should_stop("a b c", 3)
+    clip = GenerationPolicy("c", clip_budget=3)
+    assert not clip.should_stop("a b", 2) and clip.should_stop("a b c", 3)
+    assert not POLICIES["default"].streams_budget and POLICIES["flux-clip"].streams_budget
+
+
+def test_get_policy_falls_back_to_default():
+    assert get_policy("concise").name == "concise"
+    assert get_policy("no-such-policy").name == "default"
+
+
+def test_token_budget_stops_the_stream_early(server):
+    result = run_generation("llava:7b", "describe", IMAGE_OPTIONS, policy=POLICIES["concise"])
+    assert result["done_reason"] == "client_stop"
+    assert len(result["response"].split()) <= 220
+    assert server.stats["client_disconnects"] <= 1
+
+
+def test_policy_report_counts_savings(server):
+    run_generation("llava:7b", "describe", IMAGE_OPTIONS, policy=POLICIES["default"])
+    run_generation("llava:7b", "describe", IMAGE_OPTIONS, policy=POLICIES["flux-clip"])
+    report = policy_report()
+    assert report["default"]["requests"] == 1 and report["default"]["mean_eval_tokens"] == 400
+    clip = report["flux-clip"]
+    assert clip["requests"] == 1 and clip["early_stops"] == 1
+    assert clip["eval_tokens_saved"] > 0
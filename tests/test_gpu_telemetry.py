@@ -0,0 +1,83 @@
+"""GPU telemetry: ring buffers, summaries, backend lifecycle and the HTML panel."""
+
+import subprocess
+import sys
+
+import gpu_telemetry
+from gpu_info import get_telemetry_html
+from gpu_telemetry import FakeBackend, GpuSample, GpuTelemetry, NvidiaSmiBackend, sparkline
+
+
+class StaticBackend:
+    name = "static"
+
+    def __init__(self, gpu_name="GPU"):
+        self.gpu_name = gpu_name
+        self.util = 0.0
+        self.closed = False
+
+    def sample(self):
+        self.util += 10
+        return [GpuSample(0.0, 0, self.gpu_name, self.util, 1000.0, 4000.0, 50.0, None)]
+
+    def close(self):
+        self.closed = True
+
+
+def test_history_is_a_bounded_ring_buffer():
+    telemetry = GpuTelemetry(StaticBackend(), history=3)
+    for _ in range(5):
+        telemetry.sample_once()
+    assert [s.util for s in telemetry.history(0)] == [30.0, 40.0, 50.0]
+    assert telemetry.latest()[0].util == 50.0
+    assert telemetry.summary(0)["util"] == (30.0, 40.0, 50.0)
+    assert "power_w" not in telemetry.summary(0)
+    assert telemetry.sample_cost()["samples"] == 3
+
+
+def test_fake_backend_reports_every_gpu():
+    samples = FakeBackend(gpus=2, seed=0).sample()
+    assert [s.index for s in samples] == [0, 1]
+    assert all(0 <= s.util <= 100 and s.mem_used_mb <= s.mem_total_mb for s in samples)
+
+
+def test_sparkline_scales_to_bounds():
+    assert sparkline([0, 50, 100], lo=0, hi=100) == "▁▅█"
+    assert sparkline(list(range(100)), width=5) == sparkline(list(range(95, 100)))
+    assert sparkline([]) == ""
+
+
+def test_stop_drops_an_auto_selected_backend(monkeypatch):
+    created = []
+    monkeypatch.setattr(gpu_telemetry, "create_backend", lambda **_: created.append(StaticBackend()) or created[-1])
+    telemetry = GpuTelemetry(interval_s=0.01)
+    assert telemetry.start()
+    telemetry.stop()
+    assert created[0].closed and telemetry.backend is None
+    assert telemetry.start()
+    telemetry.stop()
+    assert len(created) == 2
+
+
+def test_stop_keeps_a_given_backend():
+    backend = StaticBackend()
+    telemetry = GpuTelemetry(backend, interval_s=0.01)
+    telemetry.start()
+    telemetry.stop()
+    assert backend.closed and telemetry.backend is backend
+
+
+def test_nvidia_smi_close_reaps_the_process():
+    backend = NvidiaSmiBackend.__new__(NvidiaSmiBackend)
+    backend._proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    backend.close()
+    assert backend._proc.returncode is not None
+
+
+def test_html_escapes_names_and_errors():
+    telemetry = GpuTelemetry(StaticBackend("<b>GPU</b>"))
+    telemetry.error = "bad <output> & more"
+    assert "bad &lt;output&gt; &amp; more" in get_telemetry_html(telemetry)
+    telemetry.sample_once()
+    html = get_telemetry_html(telemetry)
+    assert "&lt;b&gt;GPU&lt;/b&gt;" in html and "<b>GPU</b>" not in html
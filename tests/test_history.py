@@ -0,0 +1,66 @@
+"""History model: full-text filtering through trigram signatures and the spool."""
+
+import os
+
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from constants import HISTORY_FILTER_BITS  # noqa: E402
+from history import HistoryPanel, trigram_signature  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def panel(app):
+    return HistoryPanel()
+
+
+def visible_sources(panel):
+    return sorted(panel.proxy.index(r, 0).data().split()[1] for r in range(panel.proxy.rowCount()))
+
+
+def test_signature_covers_substrings():
+    text = "a woman in a denim jacket, café lighting"
+    signature = trigram_signature(text)
+    for term in ("denim", "jacket,", "café", "n in a"):
+        mask = trigram_signature(term)
+        assert signature & mask == mask
+    assert trigram_signature("ab") == 0
+    assert signature.bit_length() <= HISTORY_FILTER_BITS
+
+
+def test_signature_size_is_bounded():
+    short, long = trigram_signature("short text"), trigram_signature(" ".join(f"word{i}" for i in range(5000)))
+    assert long.bit_length() <= HISTORY_FILTER_BITS and short.bit_length() <= HISTORY_FILTER_BITS
+
+
+def test_filter_matches_full_text_beyond_preview(panel):
+    panel.model.add_result("filler " * 100 + "golden Earrings", "llava:7b", "a.jpg")
+    panel.model.add_result("plain description", "moondream", "b.jpg")
+    panel.filter_edit.setText("earrings GOLDEN")
+    assert visible_sources(panel) == ["a.jpg"]
+    panel.filter_edit.setText("moondream")
+    assert visible_sources(panel) == ["b.jpg"]
+    panel.filter_edit.setText("ai")  # shorter than a trigram: checked against the text directly
+    assert visible_sources(panel) == ["b.jpg"]
+    panel.filter_edit.setText("nothing-like-this")
+    assert visible_sources(panel) == []
+    panel.filter_edit.setText("")
+    assert visible_sources(panel) == ["a.jpg", "b.jpg"]
+
+
+def test_rows_added_under_active_filter_are_matched(panel):
+    panel.model.add_result("an old result", "llava", "old.jpg")
+    panel.filter_edit.setText("zebra")
+    assert visible_sources(panel) == []
+    panel.model.add_result("a zebra never seen before", "llava", "new.jpg")
+    panel.model.add_result("a horse", "llava", "other.jpg")
+    assert visible_sources(panel) == ["new.jpg"]
@@ -0,0 +1,67 @@
+"""Perceptual hashing: dHash stability, BK-tree search and the duplicate index."""
+
+import io
+import random
+
+import numpy as np
+from PIL import Image
+
+from image_hash import BKTree, DuplicateIndex, dhash, hamming
+
+
+def _photo(seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    return Image.fromarray(blocks).resize((640, 480), Image.Resampling.BILINEAR)
+
+
+def test_dhash_survives_rescale_and_reencode():
+    original = _photo()
+    buf = io.BytesIO()
+    original.resize((320, 240)).save(buf, format="JPEG", quality=70)
+    copy = Image.open(io.BytesIO(buf.getvalue()))
+    assert hamming(dhash(original), dhash(copy)) <= 4
+    assert hamming(dhash(original), dhash(_photo(seed=1))) > 10
+
+
+def test_dhash_size():
+    assert dhash(_photo()).bit_length() <= 64
+    assert dhash(_photo(), hash_size=16).bit_length() <= 256
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b1011) == 0
+    assert hamming(0b1011, 0b0110) == 3
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(0)
+    hashes = list(dict.fromkeys(rng.getrandbits(64) for _ in range(500)))
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+    assert len(tree) == len(hashes)
+    for query in hashes[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        for max_distance in (0, 8, 28):
+            expected = sorted(hamming(query, h) for h in hashes if hamming(query, h) <= max_distance)
+            found = tree.search(query, max_distance)
+            assert [d for d, _ in found] == expected
+            assert all(hamming(query, hashes[i]) == d for d, i in found)
+
+
+def test_bktree_same_hash_replaces_value():
+    tree = BKTree()
+    tree.add(5, "old")
+    tree.add(5, "new")
+    assert len(tree) == 1
+    assert tree.search(5, 0) == [(0, "new")]
+
+
+def test_duplicate_index_is_partitioned_by_model_and_prompt():
+    index = DuplicateIndex()
+    index.add(0b1111, "llava", "describe", "a.jpg", "A cat.")
+    assert index.lookup(0b1110, "llava", "describe", 2) == (1, {"path": "a.jpg", "description": "A cat."})
+    assert index.lookup(0b1110, "bakllava", "describe", 2) is None
+    assert index.lookup(0b1110, "llava", "other prompt", 2) is None
+    assert index.lookup(0b0000, "llava", "describe", 2) is None
+    assert index.lookup(0b1111, "llava", "describe", -1) is None  # negative distance disables reuse
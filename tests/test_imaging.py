@@ -0,0 +1,114 @@
+"""Payload preparation: content classification, budget-aware encoding and the payload cache."""
+
+import base64
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from imaging import (
+    JPEG_MAX_QUALITY,
+    EncodeStats,
+    _encode,
+    classify_content,
+    downscale,
+    encode_for_budget,
+    prepare_image_payload,
+)
+
+
+def _photo(size=(640, 480), seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    smooth = Image.fromarray(blocks).resize(size, Image.Resampling.BICUBIC)
+    grain = rng.integers(-12, 13, (size[1], size[0], 3))
+    return Image.fromarray(np.clip(np.asarray(smooth, dtype=int) + grain, 0, 255).astype(np.uint8))
+
+
+def _graphic() -> Image.Image:
+    img = Image.new("RGB", (400, 300), (30, 90, 200))
+    ImageDraw.Draw(img).ellipse((100, 50, 300, 250), fill=(250, 200, 0))
+    return img
+
+
+def _text() -> Image.Image:
+    img = _photo(size=(400, 300))
+    draw = ImageDraw.Draw(img)
+    for y in range(0, 300, 6):
+        for x in range(0, 400, 4):
+            draw.point((x, y), fill=(0, 0, 0))
+            draw.point((x + 1, y + 2), fill=(255, 255, 255))
+    return img
+
+
+def test_classify_content():
+    assert classify_content(_graphic()) == "graphic"
+    assert classify_content(_photo()) == "photo"
+    assert classify_content(_text()) == "text"
+
+
+def test_graphic_is_encoded_losslessly():
+    encoded = encode_for_budget(_graphic())
+    assert encoded["strategy"] == "graphic/png" and encoded["quality"] is None
+    assert encoded["within_budget"]
+    assert Image.open(io.BytesIO(encoded["data"])).format == "PNG"
+
+
+def test_photo_uses_the_highest_quality_that_fits():
+    img = _photo()
+    roomy = encode_for_budget(img, max_bytes=10_000_000)
+    assert roomy["strategy"] == "photo/jpeg" and roomy["quality"] == JPEG_MAX_QUALITY
+    tight = encode_for_budget(img, max_bytes=len(roomy["data"]) * 2 // 3)
+    assert tight["within_budget"] and tight["quality"] < JPEG_MAX_QUALITY
+
+
+def test_fidelity_floor_wins_over_the_budget():
+    encoded = encode_for_budget(_photo(), max_bytes=1_000, min_quality=70)
+    assert encoded["quality"] == 70
+    assert not encoded["within_budget"]
+
+
+def test_noisy_image_at_high_quality_encodes():
+    # Without chroma subsampling this overflows Pillow's buffer for optimised JPEGs
+    noise = np.random.default_rng(0).integers(0, 256, (600, 800, 3), dtype=np.uint8)
+    data = _encode(Image.fromarray(noise), "JPEG", 90, subsampling=0)
+    assert Image.open(io.BytesIO(data)).size == (800, 600)
+
+
+def test_downscale_keeps_aspect_ratio():
+    assert downscale(Image.new("RGB", (1600, 900)), 800).size == (800, 450)
+    small = Image.new("RGB", (200, 100))
+    assert downscale(small, 800) is small
+
+
+def test_encode_stats_report():
+    stats = EncodeStats()
+    for size, within in ((100, True), (300, False)):
+        stats.add({"strategy": "photo/jpeg", "payload_bytes": size, "encode_s": 0.01, "within_budget": within})
+    stats.add({"strategy": "graphic/png", "payload_bytes": 50, "encode_s": 0.002, "within_budget": True})
+    assert stats.report() == {
+        "graphic/png": {"count": 1, "over_budget": 0, "avg_bytes": 50, "avg_encode_ms": 2.0},
+        "photo/jpeg": {"count": 2, "over_budget": 1, "avg_bytes": 200, "avg_encode_ms": 10.0},
+    }
+
+
+def test_prepare_image_payload_is_cached_per_file_version(tmp_path):
+    path = tmp_path / "photo.png"
+    _photo(size=(1600, 1200)).save(path)
+    first = prepare_image_payload(path)
+    assert prepare_image_payload(path) is first
+    assert Image.open(io.BytesIO(base64.b64decode(first["image_b64"]))).size == (800, 600)
+
+    _photo(size=(1600, 1200), seed=1).save(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = prepare_image_payload(path)
+    assert second is not first and second["hash"] != first["hash"]
+    assert prepare_image_payload(path, max_bytes=50_000) is not second
+
+
+def test_prepare_image_payload_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        prepare_image_payload(tmp_path / "nope.jpg")
@@ -0,0 +1,90 @@
+"""BatchJournal: replay, torn tails, reconciliation with the output file, resuming elsewhere."""
+
+import json
+import os
+
+import pytest
+
+from journal import BatchJournal
+
+META = {"model": "llava", "prompt": "p", "policy": None, "out": "-"}
+
+
+def result(path, model="llava", error=""):
+    return {"path": path, "model": model, "description": "" if error else f"about {path}", "error": error}
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        (tmp_path / name).write_bytes(b"")
+    return ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_create_refuses_existing(tmp_path):
+    path = str(tmp_path / "job.journal")
+    BatchJournal.create(path, [], META).close()
+    with pytest.raises(FileExistsError):
+        BatchJournal.create(path, [], META)
+
+
+def test_replay_pending_and_failures(images, tmp_path):
+    path = str(tmp_path / "job.journal")
+    journal = BatchJournal.create(path, [(p, "llava") for p in images], META)
+    journal.record_start("a.jpg", "llava")
+    journal.record_result(result("a.jpg"))
+    journal.record_result(result("b.jpg", error="boom"))
+    journal.close()
+
+    journal = BatchJournal.open(path)
+    assert journal.meta == META
+    assert [os.path.basename(p) for p, _ in journal.pending()] == ["b.jpg", "c.jpg"]
+    assert journal.stats()["failed"] == 1
+
+    # The failed image succeeds on the resumed run: it no longer counts as failed
+    journal.record_result(result("b.jpg"))
+    assert (journal.stats()["done"], journal.stats()["failed"]) == (2, 0)
+    journal.close()
+    assert BatchJournal.open(path).stats()["failed"] == 0
+
+
+def test_torn_tail_is_dropped(images, tmp_path):
+    path = str(tmp_path / "job.journal")
+    journal = BatchJournal.create(path, [(p, "llava") for p in images], META)
+    journal.record_result(result("a.jpg"))
+    journal.close()
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"op":"done","id":1,"res')
+    journal = BatchJournal.open(path)
+    assert journal.stats()["done"] == 1
+    journal.record_result(result("c.jpg"))
+    journal.close()
+    assert BatchJournal.open(path).stats()["done"] == 2
+
+
+def test_paths_resolved_so_resume_works_from_another_directory(images, tmp_path, monkeypatch):
+    path = str(tmp_path / "job.journal")
+    BatchJournal.create(path, [(p, "llava") for p in images], META).close()
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    journal = BatchJournal.open(path)
+    pending = [p for p, _ in journal.pending()]
+    assert all(os.path.isfile(p) for p in pending) and len(pending) == 3
+    journal.record_result(result(pending[0]))
+    assert len(journal.pending()) == 2
+
+
+def test_reconcile_output(images, tmp_path):
+    path, out = str(tmp_path / "job.journal"), tmp_path / "out.jsonl"
+    journal = BatchJournal.create(path, [(p, "llava") for p in images], META)
+    journal.record_result(result(str(tmp_path / "a.jpg")))  # journaled, lost from the output
+    journal.close()
+    out.write_text(json.dumps(result(str(tmp_path / "b.jpg"))) + "\n" + '{"path": "c.j')  # b written, c torn
+
+    journal = BatchJournal.open(path)
+    assert journal.reconcile_output(str(out)) == (1, 1)
+    assert [os.path.basename(p) for p, _ in journal.pending()] == ["c.jpg"]
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(os.path.basename(r["path"]) for r in lines) == ["a.jpg", "b.jpg"]
@@ -0,0 +1,53 @@
+"""Load generator: nearest-rank percentiles and a small run against the fake server."""
+
+import pytest
+
+import ollama_api
+import pipeline
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from image_hash import DuplicateIndex
+from loadgen import make_images, percentile, run_load
+
+
+@pytest.mark.parametrize(
+    "n, pct, expected",
+    [
+        (100, 50, 50),
+        (100, 95, 95),
+        (100, 99, 99),
+        (100, 100, 100),
+        (100, 7, 7),
+        (20, 95, 19),
+        (20, 50, 10),
+        (6, 50, 3),
+        (6, 99, 6),
+        (1, 50, 1),
+        (10, 0, 1),
+    ],
+)
+def test_percentile_nearest_rank(n, pct, expected):
+    values = list(range(n, 0, -1))  # unsorted on purpose
+    assert percentile(values, pct) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 95) == 0.0
+
+
+def test_make_images_are_distinct(tmp_path):
+    paths = make_images(str(tmp_path), 3, size=64)
+    assert len({open(p, "rb").read() for p in paths}) == 3
+
+
+def test_run_load_against_fake_server(monkeypatch, tmp_path):
+    paths = make_images(str(tmp_path), 6, size=64)
+    config = FakeOllamaConfig(token_rate=2000, response_tokens=10, parallel=2)
+    with FakeOllamaServer(config) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        monkeypatch.setattr(pipeline, "DUPLICATE_INDEX", DuplicateIndex())
+        result = run_load(paths, "llava:7b", io_workers=2, prepare_workers=1)
+    assert result["ok"] == 6 and result["failed"] == 0
+    latency = result["latency_s"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert result["throughput"]["images_per_s"] > 0
+
@@ -0,0 +1,76 @@
+"""ModelRegistry: one entry per tag, /api/show once per digest, vision routing."""
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry, parse_show
+
+VISION_SHOW = {"details": {"families": ["llama", "clip"], "parameter_size": "7B"}, "model_info": {}}
+TEXT_SHOW = {"details": {"families": ["llama"]}, "model_info": {"general.architecture": "llama",
+                                                                "llama.context_length": 8192}}
+
+TAGS = [
+    {"name": "llava:latest", "digest": "sha-llava"},
+    {"name": "llava:7b", "digest": "sha-llava"},
+    {"name": "llama3:8b", "digest": "sha-llama3"},
+]
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    calls = []
+
+    def show_model(name):
+        calls.append(name)
+        return VISION_SHOW if name.startswith("llava") else TEXT_SHOW
+
+    monkeypatch.setattr(model_registry, "list_models", lambda: TAGS)
+    monkeypatch.setattr(model_registry, "show_model", show_model)
+    return calls
+
+
+def test_tags_sharing_weights_are_listed_separately(ollama, tmp_path):
+    registry = ModelRegistry(str(tmp_path / "models.json"))
+    infos = registry.refresh()
+    assert [i.name for i in infos] == ["llava:latest", "llava:7b", "llama3:8b"]
+    assert [i.vision for i in infos] == [True, True, False]
+    assert ollama == ["llava:latest", "llama3:8b"]  # one /api/show per digest
+    assert registry.get("llava:7b").name == "llava:7b"
+
+
+def test_refresh_uses_disk_cache(ollama, tmp_path):
+    ModelRegistry(str(tmp_path / "models.json")).refresh()
+    ollama.clear()
+    infos = ModelRegistry(str(tmp_path / "models.json")).refresh()
+    assert ollama == []
+    assert len(infos) == 3
+
+
+def test_models_without_digest_do_not_collide(monkeypatch, tmp_path):
+    monkeypatch.setattr(model_registry, "list_models", lambda: [{"name": "a"}, {"name": "b"}])
+    monkeypatch.setattr(model_registry, "show_model", lambda name: VISION_SHOW if name == "a" else TEXT_SHOW)
+    registry = ModelRegistry(str(tmp_path / "models.json"))
+    assert [(i.name, i.vision) for i in registry.refresh()] == [("a", True), ("b", False)]
+
+
+def test_route(ollama, tmp_path):
+    registry = ModelRegistry(None)
+    registry.refresh()
+    assert registry.route("llama3:8b", needs_vision=True) == "llava:latest"
+    assert registry.route("llama3:8b", needs_vision=False) == "llama3:8b"
+    assert registry.route("unknown:1b", needs_vision=True) == "unknown:1b"
+
+
+def test_route_without_vision_model(monkeypatch):
+    monkeypatch.setattr(model_registry, "list_models", lambda: [TAGS[2]])
+    monkeypatch.setattr(model_registry, "show_model", lambda name: TEXT_SHOW)
+    registry = ModelRegistry(None)
+    registry.refresh()
+    with pytest.raises(ValueError):
+        registry.route("llama3:8b", needs_vision=True)
+
+
+def test_parse_show():
+    info = parse_show("llama3:8b", "sha", TEXT_SHOW)
+    assert not info.vision and info.context_length == 8192
+    assert parse_show("x", "sha", {"capabilities": ["completion", "vision"]}).vision
@@ -0,0 +1,78 @@
+"""Animations: format detection, key-frame sampling and the batch pipeline's frame path."""
+
+import pytest
+from PIL import Image, ImageDraw
+
+import ollama_api
+import pipeline
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from image_hash import DuplicateIndex
+from multiframe import is_animation, sample_key_frames
+
+
+def _frame(index: int, size: int = 64) -> Image.Image:
+    """A frame whose bar sits in a different place for every index, so dHashes differ."""
+    img = Image.new("RGB", (size, size), (255, 255, 255))
+    x = (index * 13) % (size - 8)
+    ImageDraw.Draw(img).rectangle((x, 0, x + 8, size), fill=(0, 0, 0))
+    return img
+
+
+def _nudged(index: int) -> Image.Image:
+    """The same frame with one pixel changed (Pillow merges byte-identical GIF frames)."""
+    img = _frame(index)
+    img.putpixel((63, 63), (200, 200, 200))
+    return img
+
+
+def _save_animation(path, frames, fmt="GIF"):
+    frames[0].save(path, format=fmt, save_all=True, append_images=frames[1:], duration=50, loop=0)
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt, suffix", [("GIF", ".gif"), ("PNG", ".png"), ("WEBP", ".webp")])
+def test_is_animation_for_animated_formats(tmp_path, fmt, suffix):
+    path = _save_animation(tmp_path / f"anim{suffix}", [_frame(i) for i in range(3)], fmt)
+    assert is_animation(path)
+
+
+def test_single_frame_and_multipage_tiff_are_not_animations(tmp_path):
+    gif = tmp_path / "still.gif"
+    _frame(0).save(gif)
+    tiff = _save_animation(tmp_path / "pages.tif", [_frame(i) for i in range(3)], "TIFF")
+    assert not is_animation(gif)
+    assert not is_animation(tiff)
+
+
+def test_sample_key_frames_skips_near_identical_frames(tmp_path):
+    frames = [_frame(0), _nudged(0), _frame(1), _nudged(1), _frame(2)]
+    path = _save_animation(tmp_path / "dupes.gif", frames)
+    assert [index for index, _ in sample_key_frames(path, max_frames=6)] == [0, 2, 4]
+
+
+def test_sample_key_frames_caps_at_max_frames(tmp_path):
+    path = _save_animation(tmp_path / "long.gif", [_frame(i) for i in range(20)])
+    kept = sample_key_frames(path, max_frames=4, min_distance=0)
+    assert len(kept) == 4
+    assert kept[0][0] == 0
+    assert all(frame.mode == "RGB" for _, frame in kept)
+
+
+def test_batch_pipeline_describes_every_key_frame(monkeypatch, tmp_path):
+    anim = _save_animation(tmp_path / "anim.gif", [_frame(i) for i in range(3)])
+    still = tmp_path / "still.jpg"
+    _frame(5).save(still)
+    config = FakeOllamaConfig(token_rate=2000, response_tokens=10)
+    with FakeOllamaServer(config) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        monkeypatch.setattr(pipeline, "DUPLICATE_INDEX", DuplicateIndex())
+        results = []
+        report = pipeline.BatchPipeline("llava:7b", prepare_workers=1, io_workers=2).run(
+            [anim, str(still)], on_result=results.append
+        )
+        requests = server.stats["requests"]
+    assert report["ok"] == 2 and report["failed"] == 0
+    by_path = {r["path"]: r for r in results}
+    assert by_path[anim]["frames"] == 3 and by_path[anim]["description"]
+    assert "frames" not in by_path[str(still)]
+    assert requests == 4
@@ -0,0 +1,95 @@
+"""Batch pipeline: input expansion, stage accounting and runs against the fake server."""
+
+import json
+import shutil
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import model_registry
+import ollama_api
+import pipeline
+from descriptions import clean_response
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from image_hash import DuplicateIndex
+from pipeline import BatchPipeline, StageStats, _bottleneck, iter_image_paths
+
+
+def _image(path, seed: int):
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    Image.fromarray(blocks).resize((160, 120), Image.Resampling.NEAREST).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeOllamaServer(FakeOllamaConfig(token_rate=2000, response_tokens=10)) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        monkeypatch.setattr(pipeline, "DUPLICATE_INDEX", DuplicateIndex())
+        yield server
+
+
+def test_iter_image_paths_expands_directories(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("b.jpg", "a.PNG", "notes.txt", "sub/c.gif"):
+        (tmp_path / name).touch()
+    explicit = str(tmp_path / "notes.txt")
+    assert iter_image_paths([str(tmp_path), explicit]) == [
+        str(tmp_path / "a.PNG"), str(tmp_path / "b.jpg"), str(tmp_path / "sub" / "c.gif"), explicit,
+    ]
+
+
+def test_stage_stats_report():
+    stats = StageStats("generate", workers=2)
+    stats.add_busy(1.0)
+    stats.add_busy(2.0)
+    stats.add_wait(0.5)
+    stats.add_limiter_wait(0.25)
+    report = stats.report(wall_s=3.0)
+    assert report["items"] == 2 and report["busy_s"] == 3.0 and report["wait_s"] == 0.5
+    assert report["limiter_wait_s"] == 0.25
+    assert report["utilisation"] == 0.5
+
+
+def test_bottleneck():
+    assert _bottleneck({"prepare": {"wait_s": 0.1}, "generate": {"wait_s": 5.0}}) == "prepare (CPU)"
+    assert _bottleneck({"prepare": {"wait_s": 5.0}, "generate": {"wait_s": 0.1}}) == "generate (Ollama/GPU)"
+
+
+def test_clean_response():
+    assert clean_response("FLUX: A *red* (bright) car.  ") == "A red bright car."
+    assert clean_response("<b>ok</b> é!") == "bokb é"
+
+
+def test_run_reports_ok_failed_and_duplicates(server, tmp_path):
+    paths = [_image(tmp_path / f"img{i}.png", seed=i) for i in range(4)]
+    copy = shutil.copy(paths[0], tmp_path / "copy.png")
+    missing = str(tmp_path / "missing.jpg")
+    results, started = [], []
+    report = BatchPipeline("llava:7b", prepare_workers=1, io_workers=1).run(
+        paths + [missing, str(copy)], on_result=results.append, on_start=lambda path, model: started.append(path)
+    )
+    assert (report["ok"], report["failed"], report["duplicates"]) == (4, 1, 1)
+    by_path = {r["path"]: r for r in results}
+    assert by_path[missing]["error"].startswith("prepare failed")
+    assert by_path[str(copy)]["duplicate_of"] == paths[0]
+    assert by_path[str(copy)]["description"] == by_path[paths[0]]["description"]
+    assert all(by_path[p]["description"] and by_path[p]["payload_bytes"] > 0 for p in paths)
+    assert sorted(started) == sorted(paths + [missing, str(copy)])
+    assert report["stages"]["prepare"]["items"] == 5
+    assert report["stages"]["generate"]["items"] == 4
+
+
+def test_main_writes_jsonl(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(model_registry.MODEL_REGISTRY, "cache_path", None)
+    images = tmp_path / "images"
+    images.mkdir()
+    for i in range(3):
+        _image(images / f"img{i}.png", seed=i)
+    out = tmp_path / "results.jsonl"
+    assert pipeline.main([str(images), "--model", "llava:7b", "--out", str(out), "--prepare-workers", "1"]) == 0
+    results = [json.loads(line) for line in out.read_text().splitlines()]
+    assert len(results) == 3
+    assert all(r["description"] and not r["error"] for r in results)
@@ -0,0 +1,65 @@
+"""Prefetch on image drop: payloads prepared ahead of Send, and model warm-up."""
+
+import threading
+
+from PIL import Image
+
+import imaging
+import ollama_api
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from imaging import prefetch_image_payload, prepare_image_payload
+
+
+def _image(path, color=(200, 40, 40)):
+    Image.new("RGB", (320, 240), color).save(path)
+    return str(path)
+
+
+def test_send_reuses_a_finished_prefetch(tmp_path):
+    path = _image(tmp_path / "a.png")
+    prefetched = prefetch_image_payload(path).result(timeout=10)
+    assert prepare_image_payload(path) is prefetched
+
+
+def test_send_waits_for_a_running_prefetch_instead_of_redoing_it(monkeypatch, tmp_path):
+    path = _image(tmp_path / "b.png")
+    release = threading.Event()
+    calls = []
+
+    def slow_prepare(*key):
+        calls.append(key)
+        release.wait(10)
+        return {"path": key[0]}
+
+    monkeypatch.setattr(imaging, "_prepare_cached", slow_prepare)
+    future = prefetch_image_payload(path)
+    assert prefetch_image_payload(path) is future  # a second drop of the same file joins the first
+
+    result = {}
+    sender = threading.Thread(target=lambda: result.update(payload=prepare_image_payload(path)))
+    sender.start()
+    sender.join(0.2)
+    assert sender.is_alive()
+    release.set()
+    sender.join(10)
+    assert result["payload"] == {"path": path}
+    assert len(calls) == 1
+
+
+def test_changed_settings_do_not_use_the_prefetch(tmp_path):
+    path = _image(tmp_path / "c.png")
+    prefetched = prefetch_image_payload(path).result(timeout=10)
+    assert prepare_image_payload(path, max_size=160) is not prefetched
+
+
+def test_warm_model_loads_the_model(monkeypatch):
+    with FakeOllamaServer(FakeOllamaConfig(load_delay_s=0.05)) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        assert ollama_api.warm_model("llava:7b", keep_alive="5m")
+        assert server.stats["model_loads"] == 1
+        assert server.stats["requests"] == 1
+
+
+def test_warm_model_reports_failure_when_unreachable(monkeypatch):
+    monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", "http://127.0.0.1:9")
+    assert not ollama_api.warm_model("llava:7b", timeout=2)
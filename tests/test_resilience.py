@@ -0,0 +1,101 @@
+"""Retry, retry budget and circuit breaker around ``ollama_api.generate``, against the fake server."""
+
+import socket
+import time
+
+import pytest
+import requests
+
+import ollama_api
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from resilience import CircuitBreaker, CircuitOpenError, OllamaHTTPError, RetryBudget, RetryPolicy
+
+MODEL = "llava:7b"
+
+
+@pytest.fixture
+def resilience(monkeypatch):
+    """Fast backoff and fresh budget/breaker for every test."""
+    monkeypatch.setattr(ollama_api, "RETRY_POLICY", RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.02))
+    monkeypatch.setattr(ollama_api, "RETRY_BUDGET", RetryBudget())
+    breaker = CircuitBreaker(ollama_api.check_health, failure_threshold=3, reset_timeout=0.3)
+    monkeypatch.setattr(ollama_api, "CIRCUIT_BREAKER", breaker)
+    return breaker
+
+
+def serve(monkeypatch, port=0, **config):
+    server = FakeOllamaServer(FakeOllamaConfig(token_rate=1000, response_tokens=5, **config), port=port).start()
+    monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_retries_transient_errors_then_succeeds(monkeypatch, resilience):
+    with serve(monkeypatch, fail_first=2, error_status=503) as server:
+        result = ollama_api.generate(MODEL, "describe")
+    assert result["done"] and result["response"]
+    assert server.stats["requests"] == 3
+    assert resilience.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_error_is_not_retried(monkeypatch, resilience):
+    with serve(monkeypatch, fail_first=5, error_status=400) as server:
+        with pytest.raises(OllamaHTTPError) as info:
+            ollama_api.generate(MODEL, "describe")
+    assert info.value.status_code == 400
+    assert server.stats["requests"] == 1
+
+
+def test_retry_budget_exhausted(monkeypatch, resilience):
+    monkeypatch.setattr(ollama_api, "RETRY_BUDGET", RetryBudget(ratio=0.0, min_retries=1))
+    with serve(monkeypatch, error_rate=1.0, error_status=503) as server:
+        with pytest.raises(OllamaHTTPError):
+            ollama_api.generate(MODEL, "describe")
+        assert server.stats["requests"] == 2  # one retry, then the budget is spent
+        with pytest.raises(OllamaHTTPError):
+            ollama_api.generate(MODEL, "describe")
+        assert server.stats["requests"] == 3  # no retry left
+
+
+def test_breaker_opens_fails_fast_and_closes_after_recovery(monkeypatch, resilience):
+    port = free_port()
+    monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", f"http://127.0.0.1:{port}")
+
+    # Nothing listening: the third connection error trips the breaker, which also stops the retries
+    with pytest.raises(CircuitOpenError):
+        ollama_api.generate(MODEL, "describe")
+    assert resilience.state == CircuitBreaker.OPEN
+
+    start = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        ollama_api.generate(MODEL, "describe")
+    assert time.monotonic() - start < 0.05
+
+    # Still down after the reset timeout: the /api/version probe fails and the circuit stays open
+    time.sleep(0.35)
+    with pytest.raises(CircuitOpenError):
+        ollama_api.generate(MODEL, "describe")
+
+    with serve(monkeypatch, port=port) as server:
+        with pytest.raises(CircuitOpenError):
+            ollama_api.generate(MODEL, "describe")  # probe only after reset_timeout
+        assert server.stats["requests"] == 0
+        time.sleep(0.35)
+        result = ollama_api.generate(MODEL, "describe")
+    assert result["done"]
+    assert resilience.state == CircuitBreaker.CLOSED
+
+
+def test_hung_server_times_out_and_is_retried(monkeypatch, resilience):
+    monkeypatch.setattr(ollama_api, "RETRY_POLICY", RetryPolicy(max_attempts=2, base_delay=0.01, max_delay=0.02))
+    with serve(monkeypatch, load_delay_s=2.0) as server:
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            ollama_api.generate(MODEL, "describe", timeout=(1, 0.3))
+        assert time.monotonic() - start < 1.5
+        assert server.stats["requests"] == 2
@@ -0,0 +1,65 @@
+"""ResidencyScheduler: group by model, prefer resident models, age out starved jobs."""
+
+import time
+
+from scheduler import ResidencyScheduler, full_model_name
+
+
+def drain(scheduler):
+    order = []
+    while (item := scheduler.get(timeout=0)) is not None:
+        order.append(item)
+    return order
+
+
+def test_full_model_name():
+    assert full_model_name("llava") == "llava:latest"
+    assert full_model_name("llava:7b") == "llava:7b"
+    assert full_model_name("registry.local:5000/team/llava") == "registry.local:5000/team/llava:latest"
+
+
+def test_groups_jobs_by_model():
+    s = ResidencyScheduler(running=lambda: [])
+    for i, model in enumerate(["a", "b", "a", "b", "a"]):
+        s.put(i, model)
+    s.close()
+    assert [m for _, m in drain(s)] == ["a", "a", "a", "b", "b"]
+    stats = s.stats()
+    assert stats["switches"] == 1 and stats["fifo_switches"] == 4 and stats["switches_avoided"] == 3
+
+
+def test_prefers_loaded_model_with_untagged_job_names():
+    s = ResidencyScheduler(running=lambda: [{"name": "llava:latest", "model": "llava:latest"}])
+    s.put("x", "bakllava")
+    s.put("y", "llava")
+    s.close()
+    assert [m for _, m in drain(s)] == ["llava", "bakllava"]
+    assert s.stats()["loaded_picks"] == 1
+
+
+def test_ps_failure_falls_back_to_queue_order():
+    def broken():
+        raise OSError("down")
+
+    s = ResidencyScheduler(running=broken)
+    s.put("x", "a")
+    s.put("y", "b")
+    s.close()
+    assert [m for _, m in drain(s)] == ["a", "b"]
+
+
+def test_aging_bounds_wait():
+    s = ResidencyScheduler(running=lambda: [], max_wait_s=0.05)
+    s.put("a1", "a")
+    s.put("b1", "b")
+    s.put("a2", "a")
+    assert s.get() == ("a1", "a")
+    time.sleep(0.06)
+    assert s.get() == ("b1", "b")  # waited too long; served before the rest of "a"
+    assert s.stats()["aged_picks"] == 1
+
+
+def test_get_returns_none_when_closed_and_empty():
+    s = ResidencyScheduler(running=lambda: [])
+    s.close()
+    assert s.get() is None
@@ -0,0 +1,67 @@
+"""SemanticCache: cosine lookup per (model, policy) partition, LRU eviction, embed model changes."""
+
+import numpy as np
+
+import semantic_cache
+from semantic_cache import SemanticCache
+
+
+def unit(*values):
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_hit_above_threshold_only():
+    cache = SemanticCache(threshold=0.95, max_entries=4)
+    cache.add("m", unit(1, 0, 0), "a red car", "out-a")
+    similarity, entry = cache.lookup("m", unit(1, 0.05, 0))
+    assert similarity > 0.95 and entry["output"] == "out-a"
+    assert cache.lookup("m", unit(0, 1, 0)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_partitioned_by_model_and_policy():
+    cache = SemanticCache(threshold=0.9, max_entries=4)
+    cache.add("m", unit(1, 0), "x", "full", policy="default")
+    assert cache.lookup("other", unit(1, 0)) is None
+    assert cache.lookup("m", unit(1, 0), policy="concise") is None
+    assert cache.lookup("m", unit(1, 0), policy="default")[1]["output"] == "full"
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.add("m", unit(1, 0, 0), "a", "A")
+    cache.add("m", unit(0, 1, 0), "b", "B")
+    cache.lookup("m", unit(1, 0, 0))  # touch A
+    cache.add("m", unit(0, 0, 1), "c", "C")  # evicts B
+    assert cache.lookup("m", unit(0, 1, 0)) is None
+    assert cache.lookup("m", unit(1, 0, 0))[1]["output"] == "A"
+    assert cache.lookup("m", unit(0, 0, 1))[1]["output"] == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_dimension_change_resets_every_structure():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.add("m", unit(1, 0), "a", "A", policy="p1")
+    cache.add("m", unit(0, 1), "b", "B", policy="p1")
+    cache.add("m", unit(1, 0, 0), "c", "C", policy="p2")  # new embed model, 3 dimensions
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("m", unit(1, 0, 0), policy="p2")[1]["output"] == "C"
+    cache.add("m", unit(0, 1, 0), "d", "D", policy="p2")
+    cache.add("m", unit(0, 0, 1), "e", "E", policy="p2")  # full again: evicts the oldest new entry
+    assert cache.lookup("m", unit(0, 0, 1), policy="p2")[1]["output"] == "E"
+    assert cache.lookup("m", unit(1, 0), policy="p1") is None
+
+
+def test_embed_failure_disables_for_a_while(monkeypatch):
+    calls = []
+
+    def broken(model, text):
+        calls.append(text)
+        raise RuntimeError("model not pulled")
+
+    monkeypatch.setattr(semantic_cache, "embed", broken)
+    cache = SemanticCache()
+    assert cache.embed("a") is None
+    assert cache.embed("b") is None
+    assert calls == ["a"]
@@ -0,0 +1,75 @@
+"""Tiled high-detail mode: grid layout, crop boxes, when to tile, and the batch pipeline's tiled path."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import ollama_api
+import pipeline
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from image_hash import DuplicateIndex
+from tiling import tile_boxes, tile_grid, wants_tiles
+
+
+@pytest.mark.parametrize(
+    "size, tiles, expected",
+    [
+        ((4000, 3000), 1, (1, 1)),
+        ((4000, 3000), 4, (2, 2)),
+        ((4000, 1000), 4, (1, 4)),
+        ((1000, 4000), 4, (4, 1)),
+        ((4000, 3000), 6, (2, 3)),
+        ((3000, 4000), 6, (3, 2)),
+        ((4000, 3000), 9, (3, 3)),
+    ],
+)
+def test_tile_grid_prefers_square_tiles(size, tiles, expected):
+    assert tile_grid(*size, tiles) == expected
+
+
+@pytest.mark.parametrize("tiles", [3, 5, 7])
+def test_tile_grid_does_not_force_a_strip_for_prime_counts(tiles):
+    rows, cols = tile_grid(4000, 3000, tiles)
+    assert rows > 1 and rows * cols >= tiles
+
+
+def test_tile_boxes_cover_the_image_with_overlap():
+    boxes = tile_boxes(1000, 600, 4, overlap=0.1)
+    assert len(boxes) == 4
+    assert boxes[0] == (0, 0, 550, 330)
+    assert boxes[-1] == (450, 270, 1000, 600)
+    covered = np.zeros((600, 1000), dtype=bool)
+    for left, top, right, bottom in boxes:
+        covered[top:bottom, left:right] = True
+    assert covered.all()
+
+
+def test_tile_boxes_without_overlap_partition_the_image():
+    boxes = tile_boxes(900, 600, 6, overlap=0.0)
+    assert sum((r - l) * (b - t) for l, t, r, b in boxes) == 900 * 600
+
+
+def test_wants_tiles():
+    assert wants_tiles((4000, 3000), 4)
+    assert not wants_tiles((4000, 3000), 1)
+    assert not wants_tiles((800, 600), 4)  # already within MAX_IMAGE_SIZE: crops add nothing
+    assert not wants_tiles((1000, 750), 16)  # tiles smaller than the global view's detail
+
+
+def test_batch_pipeline_tiled_mode(monkeypatch, tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "busy.png"
+    blocks = rng.integers(0, 256, (75, 100, 3), dtype=np.uint8)
+    Image.fromarray(blocks).resize((2000, 1500), Image.NEAREST).save(path)
+    config = FakeOllamaConfig(token_rate=2000, response_tokens=10)
+    with FakeOllamaServer(config) as server:
+        monkeypatch.setattr(ollama_api, "OLLAMA_BASE_URL", server.url)
+        monkeypatch.setattr(pipeline, "DUPLICATE_INDEX", DuplicateIndex())
+        results = []
+        report = pipeline.BatchPipeline("llava:7b", prepare_workers=1, tiles=4).run(
+            [str(path)], on_result=results.append
+        )
+        requests = server.stats["requests"]
+    assert report["ok"] == 1
+    assert results[0]["tiles"] == 4 and results[0]["description"]
+    assert requests == 5  # global view + 4 tiles
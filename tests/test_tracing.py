@@ -0,0 +1,63 @@
+"""Tracer: spans from pool workers reach the parent once, inherited events are not duplicated."""
+
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from PIL import Image
+
+import imaging
+from tracing import TRACER, Tracer
+
+
+@pytest.fixture
+def tracer():
+    TRACER.clear()
+    TRACER.enable()
+    yield TRACER
+    TRACER.enabled = False
+    TRACER.clear()
+
+
+def test_disabled_tracer_records_nothing():
+    t = Tracer()
+    with t.span("x") as sp:
+        sp.set(a=1)
+    t.instant("y")
+    assert t.drain() == []
+
+
+def test_span_records_args_and_errors():
+    t = Tracer()
+    t.enable()
+    with t.span("ok", cat="io", path="a") as sp:
+        sp.set(bytes=3)
+    with pytest.raises(ValueError):
+        with t.span("bad"):
+            raise ValueError
+    ok, bad = t.drain()
+    assert ok["name"] == "ok" and ok["cat"] == "io" and ok["args"] == {"path": "a", "bytes": 3} and ok["dur"] >= 0
+    assert bad["args"] == {"error": "ValueError"}
+    assert t.drain() == []
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_span_before_fork_exported_once(tracer, tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"{i}.png"
+        Image.new("RGB", (32, 32), (i * 40, 0, 0)).save(path)
+        paths.append(str(path))
+
+    with tracer.span("before_fork"):
+        pass
+    with ProcessPoolExecutor(max_workers=3, mp_context=multiprocessing.get_context("fork")) as pool:
+        for payload in pool.map(imaging.prepare_image_payload, paths):
+            tracer.extend(payload.pop("trace_events", ()))
+
+    out = tmp_path / "trace.json"
+    tracer.export_chrome(str(out))
+    names = [e["name"] for e in json.loads(out.read_text())["traceEvents"] if e["ph"] != "M"]
+    assert names.count("before_fork") == 1
+    assert names.count("decode") == len(paths)
@@ -0,0 +1,135 @@
+"""Minimal span tracer with Chrome/Perfetto JSON export.
+
+Enable by setting ``OLLAMA_IMAGE_TRACE=/path/to/trace.json`` (written at exit)
+or by calling :meth:`Tracer.enable`. Load the file in ``chrome://tracing`` or
+https://ui.perfetto.dev. When disabled, :meth:`Tracer.span` returns a shared
+no-op context manager and records nothing.
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_cat", "_args", "_start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._tracer._add_complete(self._name, self._cat, self._start, time.perf_counter_ns(), self._args)
+        return False
+
+    def set(self, **args):
+        """Attach extra arguments discovered while the span is open."""
+        self._args.update(args)
+
+
+class Tracer:
+    """Collects complete ("X") and instant ("i") events in memory."""
+
+    def __init__(self):
+        self.enabled = False
+        self._events: List[dict] = []
+        self._thread_names: Dict[int, str] = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def span(self, name: str, cat: str = "app", **args):
+        """Context manager timing *name*; a shared no-op when tracing is off."""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, cat, args)
+
+    def instant(self, name: str, cat: str = "app", **args):
+        if not self.enabled:
+            return
+        self._events.append(
+            {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": time.perf_counter_ns() / 1000,
+             "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+        )
+
+    def _add_complete(self, name: str, cat: str, start_ns: int, end_ns: int, args: dict):
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        # list.append is atomic under the GIL, so no lock is needed
+        self._events.append(
+            {"name": name, "cat": cat, "ph": "X", "ts": start_ns / 1000, "dur": (end_ns - start_ns) / 1000,
+             "pid": os.getpid(), "tid": tid, "args": args}
+        )
+
+    def drain(self) -> List[dict]:
+        """Remove and return recorded events (used to ship events out of worker processes)."""
+        events, self._events = self._events, []
+        return events
+
+    def clear(self):
+        """Forget recorded events, e.g. the parent's events a forked worker inherited."""
+        self._events = []
+        self._thread_names = {}
+
+    def extend(self, events: Iterable[dict]):
+        self._events.extend(events)
+
+    def export_chrome(self, path: str):
+        """Write recorded events as a Chrome trace-event JSON file."""
+        events = list(self._events)
+        lanes = {(e["pid"], e["tid"]) for e in events}
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+             "args": {"name": self._thread_names.get(tid, f"worker {pid}")}}
+            for pid, tid in lanes
+        ]
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, fh)
+
+
+def in_worker_process() -> bool:
+    return multiprocessing.parent_process() is not None
+
+
+TRACER = Tracer()
+span = TRACER.span
+
+if hasattr(os, "register_at_fork"):
+    # Forked pool workers ship their events back to the parent; without this they
+    # would also ship copies of everything the parent had recorded before the fork
+    os.register_at_fork(after_in_child=TRACER.clear)
+
+_trace_path: Optional[str] = os.environ.get("OLLAMA_IMAGE_TRACE")
+if _trace_path:
+    TRACER.enable()
+    if not in_worker_process():
+        atexit.register(TRACER.export_chrome, _trace_path)
@@ -1,5 +1,7 @@
 from typing import Optional
+import logging
 import sys
+import threading
 from pathlib import Path
 
 from PyQt6.QtWidgets import (
@@ -14,14 +16,33 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QMessageBox,
     QComboBox,
+    QCheckBox,
     QFrame,
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QPixmap, QDragEnterEvent, QDropEvent
 
-from constants import FONT_SIZE, LAVENDER_LIGHT, LAVENDER_MID, LAVENDER_DARK, DEFAULT_PROMPT
-from ollama_api import check_ollama, get_available_models
+from constants import (
+    FONT_SIZE,
+    LAVENDER_LIGHT,
+    LAVENDER_MID,
+    LAVENDER_DARK,
+    DEFAULT_PROMPT,
+    PREFETCH_SPECULATIVE_GENERATE,
+    PREFETCH_WARM_MODEL,
+    TILE_COUNT,
+    TILED_MODE,
+)
+from ollama_api import check_ollama, get_available_models, warm_model
+from generation import POLICIES, get_policy, policy_report
 from gpu_info import get_gpu_info_html
+from gpu_telemetry import GPU_TELEMETRY
+from history import HistoryPanel
+from imaging import prefetch_image_payload
+from model_registry import MODEL_REGISTRY
+from multiframe import is_animation
+from semantic_cache import SEMANTIC_CACHE
+from tracing import span
 from workers import PromptWorker, PromptWorkerTextOnly
 
 
@@ -50,6 +71,16 @@ class DragDropImageLabel(QLabel):
         self.image_dropped.emit(file_path)
 
 
+class _Speculation:
+    """A generation started on image drop, adopted by Send if its inputs still match."""
+
+    def __init__(self, inputs: tuple, worker: PromptWorker):
+        self.inputs = inputs
+        self.worker = worker
+        self.outcome: Optional[tuple] = None  # ("done", prompts) or ("error", msg)
+        self.adopted = False
+
+
 class ImageToPromptApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -132,6 +163,22 @@ class ImageToPromptApp(QMainWindow):
         self._populate_models()
         right.addWidget(self.model_combo)
 
+        # Generation-length policy
+        right.addWidget(QLabel("Output Length Policy:"))
+        self.policy_combo = QComboBox()
+        self.policy_combo.addItems(list(POLICIES))
+        self.policy_combo.setCurrentText(get_policy().name)
+        right.addWidget(self.policy_combo)
+
+        # Tiled high-detail mode
+        self.tiled_check = QCheckBox("High-detail tiled mode")
+        self.tiled_check.setChecked(TILED_MODE)
+        self.tiled_check.setToolTip(
+            f"Large images are also described as {TILE_COUNT} native-resolution crops and the results merged. "
+            f"More detail, about {TILE_COUNT + 1}x the GPU time."
+        )
+        right.addWidget(self.tiled_check)
+
         # Send button
         self.send_btn = QPushButton("Send")
         self.send_btn.clicked.connect(self._on_send_prompt)
@@ -148,17 +195,37 @@ class ImageToPromptApp(QMainWindow):
         # Info frame
         self._build_info_frame(right)
 
+        # ---- History panel ----
+        history = QVBoxLayout()
+        main_layout.addLayout(history)
+        history.addWidget(QLabel("History:"))
+        self.history = HistoryPanel()
+        self.history.setMinimumWidth(420)
+        self.history.activated.connect(self.flux_out.setText)
+        open_btn = QPushButton("Open Batch Results")
+        open_btn.clicked.connect(self._on_open_batch_results)
+        self.history.buttons.addWidget(open_btn)
+        history.addWidget(self.history)
+
         # Timer for auto-refresh
         self.refresh_timer = QTimer(self)
         self.refresh_timer.timeout.connect(self._refresh_info)
         self.refresh_timer.start(10000)
 
+        # GPU readings come from the telemetry ring buffer, so they can refresh often
+        self.gpu_timer = QTimer(self)
+        self.gpu_timer.timeout.connect(self._refresh_gpu_label)
+        self.gpu_timer.start(2000)
+
         # Populate info panel immediately
         self._refresh_info()
 
         # State vars
         self.current_image: Optional[str] = None
-        self.worker = None
+        self.worker = None  # image job
+        self.text_worker = None  # text-only job; runs alongside an image job
+        self._speculation: Optional[_Speculation] = None
+        self._background_workers: set = set()  # abandoned speculative workers, kept alive until they stop
 
     # ---------------------------------------------------------------------
     # UI helpers
@@ -196,6 +263,57 @@ class ImageToPromptApp(QMainWindow):
         self.current_image = path
         self._display_image(path)
         self.send_btn.setEnabled(True)
+        self._start_prefetch(path)
+
+    def _image_job_inputs(self, model: str) -> tuple:
+        return (
+            self.current_image,
+            model,
+            self.prompt_edit.toPlainText(),
+            self.policy_combo.currentText(),
+            self.tiled_check.isChecked(),
+        )
+
+    def _start_prefetch(self, path: str):
+        """Start Send's work early; Send reuses it only if the inputs are unchanged."""
+        self._speculation = None
+        self._background_workers = {w for w in self._background_workers if w.isRunning()}
+        try:
+            # Animations are described frame by frame; the still-image payload would go unused
+            if not is_animation(path):
+                prefetch_image_payload(path)
+        except OSError:
+            return
+        try:
+            model = MODEL_REGISTRY.route(self._selected_model(), needs_vision=True)
+        except ValueError:
+            return
+        if PREFETCH_SPECULATIVE_GENERATE:
+            inputs = self._image_job_inputs(model)
+            worker = PromptWorker(Path(path), model, inputs[2], inputs[3], inputs[4])
+            spec = _Speculation(inputs, worker)
+            worker.finished.connect(lambda prompts: self._on_speculation_result(spec, "done", prompts))
+            worker.error.connect(lambda msg: self._on_speculation_result(spec, "error", msg))
+            worker.duplicate.connect(lambda p, d: spec.adopted and self._on_duplicate_image(p, d))
+            worker.report.connect(lambda r: spec.adopted and self._on_worker_report(r))
+            self._background_workers.add(worker)
+            self._speculation = spec
+            worker.start()
+        elif PREFETCH_WARM_MODEL:
+            threading.Thread(target=warm_model, args=(model,), name="warm-model", daemon=True).start()
+
+    def _on_speculation_result(self, spec: _Speculation, kind: str, value):
+        # The thread is still inside run() when it emits; it is dropped from
+        # _background_workers only once isRunning() is False (see _start_prefetch)
+        spec.outcome = (kind, value)
+        if spec.adopted:
+            self._deliver_image_result(spec.worker, kind, value)
+
+    def _deliver_image_result(self, worker: PromptWorker, kind: str, value):
+        if kind == "done":
+            self._on_prompt_done(value, worker)
+        else:
+            self._on_worker_error(value)
 
     def _on_upload_image(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -207,21 +325,73 @@ class ImageToPromptApp(QMainWindow):
     def _on_send_prompt(self):
         if not self.current_image:
             return
+        selected = self._selected_model()
+        try:
+            model = MODEL_REGISTRY.route(selected, needs_vision=True)
+        except ValueError as exc:
+            QMessageBox.warning(self, "No Vision Model", str(exc))
+            return
+        if model != selected:
+            self.statusBar().showMessage(f"{selected} cannot read images; using {model} instead.", 10000)
         self.flux_out.setText("Analyzing image...")
         self.send_btn.setEnabled(False)
         self.upload_btn.setEnabled(False)
-        model = self.model_combo.currentText()
+
+        spec, self._speculation = self._speculation, None
+        if spec is not None and spec.inputs == self._image_job_inputs(model):
+            spec.adopted = True
+            self.worker = spec.worker
+            if spec.outcome is not None:
+                self._deliver_image_result(spec.worker, *spec.outcome)
+            return
+
         prompt = self.prompt_edit.toPlainText()
-        self.worker = PromptWorker(Path(self.current_image), model, prompt)
-        self.worker.finished.connect(self._on_prompt_done)
-        self.worker.error.connect(self._on_worker_error)
-        self.worker.start()
+        worker = PromptWorker(
+            Path(self.current_image), model, prompt, self.policy_combo.currentText(), self.tiled_check.isChecked()
+        )
+        # Bind the worker to its slots: a text-only job may start while this one runs
+        worker.finished.connect(lambda prompts, w=worker: self._on_prompt_done(prompts, w))
+        worker.error.connect(self._on_worker_error)
+        worker.duplicate.connect(self._on_duplicate_image)
+        worker.report.connect(self._on_worker_report)
+        self.worker = worker
+        worker.start()
+
+    def _on_worker_report(self, report: dict):
+        if "tiles" in report:
+            skipped = f", {report['tiles_skipped']} flat tiles skipped" if report["tiles_skipped"] else ""
+            self.statusBar().showMessage(
+                f"Tiled: global view + {report['tiles']} tiles of {report['image_size'][0]}x{report['image_size'][1]} "
+                f"in {report['wall_s']:.1f}s{skipped}",
+                15000,
+            )
+            return
+        self.statusBar().showMessage(
+            f"Animation: described {report['frames_sampled']} of {report['frames_total']} frames "
+            f"in {report['wall_s']:.1f}s (sampling {report['sample_s']:.2f}s)",
+            15000,
+        )
 
-    def _on_prompt_done(self, prompts):
+    def _on_duplicate_image(self, matched_path: str, distance: int):
+        self.statusBar().showMessage(
+            f"Near-duplicate of {Path(matched_path).name} (distance {distance}); reused its description.", 10000
+        )
+
+    def _on_prompt_done(self, prompts, worker: PromptWorker):
         _, flux_prompt = prompts
         self.flux_out.setText(flux_prompt)
+        self.history.model.add_result(flux_prompt, worker.model_name, Path(worker.image_path).name, worker.image_path)
         self.send_btn.setEnabled(True)
         self.upload_btn.setEnabled(True)
+        self._update_policy_tooltip()
+
+    def _update_policy_tooltip(self):
+        lines = [
+            f"{name}: {r['requests']} runs, {r['mean_eval_tokens']:.0f} tokens / {r['mean_latency_s']:.1f}s avg, "
+            f"~{r['eval_tokens_saved']} tokens and {r['latency_saved_s']:.0f}s saved, {r['early_stops']} early stops"
+            for name, r in policy_report().items()
+        ]
+        self.policy_combo.setToolTip("\n".join(lines))
 
     def _on_worker_error(self, msg: str):
         QMessageBox.critical(self, "Error", f"Failed: {msg}")
@@ -235,16 +405,43 @@ class ImageToPromptApp(QMainWindow):
             return
         self.text_only_btn.setEnabled(False)
         self.flux_out.clear()
-        model = self.model_combo.currentText()
-        self.worker = PromptWorkerTextOnly(text, model)
-        self.worker.finished.connect(self._on_text_only_done)
-        self.worker.error.connect(self._on_worker_error)
-        self.worker.start()
+        model = self._selected_model()
+        worker = PromptWorkerTextOnly(text, model, self.policy_combo.currentText())
+        worker.finished.connect(lambda prompts, w=worker: self._on_text_only_done(prompts, w))
+        worker.error.connect(self._on_text_only_error)
+        worker.cached.connect(self._on_text_cache_hit)
+        self.text_worker = worker
+        worker.start()
+
+    def _on_text_cache_hit(self, similarity: float, earlier_input: str):
+        stats = SEMANTIC_CACHE.stats()
+        self.statusBar().showMessage(
+            f"Reused output of a similar earlier input (similarity {similarity:.2f}, "
+            f"cache hit rate {stats['hit_rate']:.0%}): {earlier_input[:60]}",
+            15000,
+        )
+
+    def _on_text_only_error(self, msg: str):
+        QMessageBox.critical(self, "Error", f"Failed: {msg}")
+        self.text_only_btn.setEnabled(True)
 
-    def _on_text_only_done(self, prompts):
+    def _on_text_only_done(self, prompts, worker: PromptWorkerTextOnly):
         _, flux_prompt = prompts
         self.flux_out.setText(flux_prompt)
+        self.history.model.add_result(flux_prompt, worker.model_name, f"text: {worker.text[:40]}")
         self.text_only_btn.setEnabled(True)
+        self._update_policy_tooltip()
+
+    def _on_open_batch_results(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open Batch Results", "", "JSON Lines (*.jsonl);;All Files (*)")
+        if not file_name:
+            return
+        try:
+            added = self.history.model.load_jsonl(file_name)
+        except (OSError, ValueError, KeyError) as exc:
+            QMessageBox.warning(self, "Open Batch Results", f"Could not read {file_name}: {exc}")
+            return
+        self.statusBar().showMessage(f"Added {added} results from {Path(file_name).name} to the history.", 10000)
 
     # ------------------------------------------------------------------
     def _display_image(self, path: str):
@@ -254,14 +451,33 @@ class ImageToPromptApp(QMainWindow):
         )
         self.image_label.setPixmap(scaled)
 
+    def _selected_model(self) -> str:
+        return self.model_combo.currentData() or self.model_combo.currentText()
+
     def _populate_models(self):
         self.model_combo.clear()
-        for name in get_available_models():
-            self.model_combo.addItem(name)
+        try:
+            infos = MODEL_REGISTRY.refresh()
+        except Exception:
+            infos = []
+        if infos:
+            for info in infos:
+                label = f"{info.name}  [vision]" if info.vision else info.name
+                self.model_combo.addItem(label, info.name)
+                self.model_combo.setItemData(
+                    self.model_combo.count() - 1, info.summary(), Qt.ItemDataRole.ToolTipRole
+                )
+        else:
+            for name in get_available_models():
+                self.model_combo.addItem(name, name)
         if self.model_combo.count() == 0:
             self.model_combo.addItem("<none>")
 
     def _refresh_info(self):
+        with span("poll", cat="poll"):
+            self._refresh_info_labels()
+
+    def _refresh_info_labels(self):
         # Update models
         names = get_available_models()
         if names:
@@ -270,13 +486,26 @@ class ImageToPromptApp(QMainWindow):
             self.models_label.show()
         else:
             self.models_label.hide()
-        # Update GPU
-        gpu_text = get_gpu_info_html()
-        print("[DEBUG] Setting gpu_label to:", gpu_text)
+        self._refresh_gpu_label()
+
+    def _refresh_gpu_label(self):
+        with span("gpu_info", cat="poll"):
+            gpu_text = get_gpu_info_html()
         self.gpu_label.setText(gpu_text)
+        cost = GPU_TELEMETRY.sample_cost()
+        if cost["samples"]:
+            self.gpu_label.setToolTip(
+                f"{cost['samples']} samples, {cost['wall_ms_mean']:.2f} ms wall / "
+                f"{cost['cpu_ms_mean']:.2f} ms CPU per sample (max {cost['wall_ms_max']:.2f} ms; {cost['scope']})"
+            )
+
+    def closeEvent(self, event):
+        GPU_TELEMETRY.stop()
+        super().closeEvent(event)
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
     app = QApplication(sys.argv)
     win = ImageToPromptApp()
     win.show()
@@ -1,15 +1,16 @@
-import base64
-import io
-import json
 from pathlib import Path
-from typing import Tuple
 
 from PyQt6.QtCore import QThread, pyqtSignal
-from PIL import Image
-import requests
 
-from constants import DEFAULT_PROMPT
-from ollama_api import OLLAMA_BASE_URL
+from constants import DEFAULT_PROMPT, DUPLICATE_MAX_DISTANCE, IMAGE_OPTIONS, TEXT_OPTIONS, TILE_COUNT
+from descriptions import clean_response
+from image_hash import DUPLICATE_INDEX
+from imaging import prepare_image_payload
+from multiframe import describe_frames, is_animation
+from generation import get_policy, run_generation
+from semantic_cache import SEMANTIC_CACHE
+from tiling import describe_tiled
+from tracing import span
 
 
 class PromptWorker(QThread):
@@ -17,48 +18,63 @@ class PromptWorker(QThread):
 
     finished = pyqtSignal(tuple)  # (sdxl_prompt, flux_prompt)
     error = pyqtSignal(str)
-
-    def __init__(self, image_path: str | Path, model_name: str, prompt: str = DEFAULT_PROMPT):
+    duplicate = pyqtSignal(str, int)  # (matched image path, hash distance)
+    report = pyqtSignal(dict)  # latency report for multi-frame and tiled images
+
+    def __init__(
+        self,
+        image_path: str | Path,
+        model_name: str,
+        prompt: str = DEFAULT_PROMPT,
+        policy: str | None = None,
+        tiled: bool = False,
+    ):
         super().__init__()
         self.image_path = str(image_path)
         self.model_name = model_name
         self.prompt = prompt or DEFAULT_PROMPT
+        self.policy = get_policy(policy)
+        self.tiled = tiled
 
     def run(self):
+        with span("describe_image", path=self.image_path, model=self.model_name):
+            self._run()
+
+    def _run(self):
         try:
-            with Image.open(self.image_path) as img:
-                if img.mode != "RGB":
-                    img = img.convert("RGB")
-                # Resize if very large (>800px in any dimension)
-                max_size = 800
-                if max(img.size) > max_size:
-                    ratio = max_size / max(img.size)
-                    new_size = tuple(int(dim * ratio) for dim in img.size)
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format="JPEG")
-                img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode()
-
-            url = f"{OLLAMA_BASE_URL}/api/generate"
-            headers = {"Content-Type": "application/json"}
-            payload = {
-                "model": self.model_name,
-                "prompt": self.prompt,
-                "stream": False,
-                "images": [img_base64],
-                "options": {
-                    "vision": True,
-                    "temperature": 0.3,
-                    "num_predict": 500,
-                },
-            }
-            resp = requests.post(url, headers=headers, json=payload)
-            if resp.status_code != 200:
-                raise RuntimeError(f"Ollama returned {resp.status_code}: {resp.text}")
-
-            response_text = resp.json()["response"]
-            cleaned = _clean_response(response_text)
+            if is_animation(self.image_path):
+                merged, report = describe_frames(self.image_path, self.model_name, self.prompt, policy=self.policy)
+                self.report.emit(report)
+                self.finished.emit(("", merged))
+                return
+
+            prepared = prepare_image_payload(self.image_path)
+            image_hash = prepared["hash"]
+            # Descriptions from other length policies or from tiled mode are not interchangeable
+            cache_prompt = f"{self.prompt}\n[policy:{self.policy.name}]"
+            if self.tiled:
+                cache_prompt += f"\n[tiled:{TILE_COUNT}]"
+
+            # Near-identical image already described? Reuse it.
+            match = DUPLICATE_INDEX.lookup(image_hash, self.model_name, cache_prompt, DUPLICATE_MAX_DISTANCE)
+            if match is not None:
+                distance, entry = match
+                self.duplicate.emit(entry["path"], distance)
+                self.finished.emit(("", entry["description"]))
+                return
+
+            if self.tiled:
+                cleaned, report = describe_tiled(
+                    self.image_path, self.model_name, self.prompt, policy=self.policy, global_b64=prepared["image_b64"]
+                )
+                self.report.emit(report)
+            else:
+                result = run_generation(
+                    self.model_name, self.prompt, IMAGE_OPTIONS, images=[prepared["image_b64"]], policy=self.policy
+                )
+                with span("clean"):
+                    cleaned = clean_response(result["response"])
+            DUPLICATE_INDEX.add(image_hash, self.model_name, cache_prompt, self.image_path, cleaned)
             self.finished.emit(("", cleaned))
         except Exception as exc:
             self.error.emit(str(exc))
@@ -67,43 +83,35 @@ class PromptWorker(QThread):
 class PromptWorkerTextOnly(QThread):
     finished = pyqtSignal(tuple)
     error = pyqtSignal(str)
+    cached = pyqtSignal(float, str)  # (similarity, earlier input whose output was reused)
 
-    def __init__(self, text: str, model_name: str):
+    def __init__(self, text: str, model_name: str, policy: str | None = None):
         super().__init__()
         self.text = text
         self.model_name = model_name
+        self.policy = get_policy(policy)
 
     def run(self):
+        with span("describe_text", model=self.model_name):
+            self._run()
+
+    def _run(self):
         try:
-            url = f"{OLLAMA_BASE_URL}/api/generate"
-            headers = {"Content-Type": "application/json"}
-            payload = {
-                "model": self.model_name,
-                "prompt": self.text,
-                "stream": False,
-                "options": {"temperature": 0.3, "num_predict": 500},
-            }
-            resp = requests.post(url, headers=headers, json=payload)
-            if resp.status_code != 200:
-                raise RuntimeError(f"Ollama returned {resp.status_code}: {resp.text}")
-            response_text = resp.json()["response"]
-            cleaned = _clean_response(response_text)
+            vector = SEMANTIC_CACHE.embed(self.text)
+            if vector is not None:
+                match = SEMANTIC_CACHE.lookup(self.model_name, vector, self.policy.name)
+                if match is not None:
+                    similarity, entry = match
+                    self.cached.emit(similarity, entry["input"])
+                    self.finished.emit(("", entry["output"]))
+                    return
+
+            result = run_generation(self.model_name, self.text, TEXT_OPTIONS, policy=self.policy)
+            with span("clean"):
+                cleaned = clean_response(result["response"])
+            if vector is not None:
+                SEMANTIC_CACHE.add(self.model_name, vector, self.text, cleaned, self.policy.name)
             self.finished.emit(("", cleaned))
         except Exception as exc:
             self.error.emit(str(exc))
 
-
-def _clean_response(text: str) -> str:
-    """Remove unwanted characters for Flux compatibility."""
-    for repl in [
-        ("  ", " "),
-        ("*", ""),
-        ("(", ""), (")", ""),
-        ("[", ""), ("]", ""),
-        ("{", ""), ("}", ""),
-        ("<", ""), (">", ""),
-        ("FLUX:", ""),
-    ]:
-        text = text.replace(*repl)
-    text = "".join(c for c in text if c.isalnum() or c.isspace() or c in ",.-_")
-    return text.strip() 
\ No newline at end of file